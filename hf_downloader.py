@@ -1,14 +1,43 @@
 import os
 import re
+import json
+import uuid
+import mmap
+import struct
+import ctypes
+import ctypes.util
+import importlib.util
+import pstats
+import cProfile
+import argparse
 import sys
 import time
+import queue
+import random
+import hashlib
+import hmac
+import secrets
 import shutil
+import signal
+import socket
+import threading
 import subprocess
+import socketserver
+import http.client
 import platform
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util import connection as urllib3_connection
 from pathlib import Path
-from urllib.parse import urlparse, unquote
+from urllib.parse import urlparse, unquote, parse_qs
 from datetime import datetime
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
 
 # =============================================
 # CONFIGURATION
@@ -21,12 +50,1737 @@ HF_USERNAME = ""
 # CivitAI Configuration
 CIVITAI_TOKEN = ""
 
-class UniversalDownloader:
+# ComfyUI Configuration
+EXTRA_MODEL_PATHS_FILE = "/root/ComfyUI/extra_model_paths.yaml"
+COMFYUI_MODELS_DIR = "/root/ComfyUI/models"
+VALIDATE_AFTER_DOWNLOAD = True   # Validasi struktur .safetensors setelah setiap download
+
+# Tiered Storage Configuration
+STAGING_DIR = ""                 # Scratch lokal cepat (mis. /tmp/model_staging); kosong = nonaktif
+MIGRATION_RATE_LIMIT = 200 * 1024**2  # Batas throughput migrasi ke volume (bytes/s, 0 = tanpa batas)
+MIGRATION_CHUNK_SIZE = 16 * 1024**2   # Ukuran chunk copy migrasi (bytes)
+MIGRATION_MAX_TRIES = 5          # Percobaan migrasi per file dalam satu sesi (backoff seperti RETRY_*)
+
+# Local Replication Configuration
+LOCAL_SOURCES = []               # Root model di volume lain yang dicek sebelum download (mis. ["/mnt/vol1/models"])
+REPLICATE_WORKERS = 4            # Jumlah file yang disalin paralel oleh replicate
+REPLICATE_CHUNK_SIZE = 64 * 1024**2   # Ukuran chunk copy_file_range / read-write (bytes)
+
+# Metadata Resolver Configuration
+RESOLVER_WORKERS = 8            # Jumlah lookup metadata paralel di depan antrean transfer
+PREFLIGHT_WORKERS = 32          # Jumlah cek preflight URL paralel (dibatasi HTTP_POOL_SIZE)
+PREFLIGHT_REPORT = "preflight_report.json"  # Report JSON hasil preflight batch interaktif
+
+# Progress Renderer Configuration
+PROGRESS_REFRESH_INTERVAL = 0.5  # Interval redraw tampilan multi-baris di terminal (detik)
+PROGRESS_LOG_INTERVAL = 15.0     # Interval log baris biasa jika stdout bukan TTY/Jupyter (detik)
+PROGRESS_MAX_ROWS = 8            # Jumlah transfer aktif yang ditampilkan per baris
+PROGRESS_TICK = 0.1              # Interval renderer membaca antrean event (detik)
+PROGRESS_CAPTURE_STDOUT = False  # Alihkan sys.stdout ke renderer (hanya mode CLI, lihat enable_stdout_capture)
+
+# Inference-Aware Throttling Configuration
+INFERENCE_THROTTLE = False       # Mengalah ke ComfyUI saat prompt dieksekusi (atau pakai --yield-to-comfyui)
+COMFYUI_URL = "http://127.0.0.1:8188"  # Endpoint ComfyUI untuk polling /queue
+INFERENCE_FLAG_FILE = ""         # Alternatif sinyal: file ini ada = sedang inference
+INFERENCE_POLL_INTERVAL = 2.0    # Interval cek status ComfyUI (detik)
+INFERENCE_THROTTLED_RATE = 10 * 1024**2  # Batas total writer in-process saat inference (bytes/s)
+INFERENCE_DUTY_CYCLE = 0.25      # Fraksi waktu aria2 berjalan saat inference (sisanya SIGSTOP)
+INFERENCE_MAX_DEFER = 600        # Batas menunda transfer HF saat inference (detik)
+
+# Selective Tensor Extraction Configuration
+EXTRACT_WORKERS = 4              # Jumlah byte range yang di-download paralel
+EXTRACT_COALESCE_GAP = 1024**2   # Range berjarak <= ini digabung jadi satu request (bytes)
+
+# Page-Cache-Friendly Write Configuration
+CACHE_FRIENDLY_WRITES = False    # Tulis download tanpa mengusir model ComfyUI dari page cache (atau --cache-friendly)
+CACHE_FRIENDLY_CHUNK_SIZE = 8 * 1024**2  # Ukuran chunk flush + drop (bytes, di-align ke page)
+CACHE_TRIM_INTERVAL = 1.0        # Interval flush + drop file yang sedang ditulis aria2 (detik)
+
+# Page Cache Warmup Configuration
+WARMUP_WORKERS = 4               # Jumlah file yang di-warmup paralel
+WARMUP_MEMORY_FRACTION = 0.5     # Budget default: fraksi dari MemAvailable
+WARMUP_CHUNK_SIZE = 16 * 1024**2 # Ukuran chunk baca saat warmup (bytes)
+
+# Download Daemon Configuration
+DAEMON_STATE_DIR = os.path.expanduser("~/.cache/universal_downloader")
+DAEMON_SOCKET = os.path.join(DAEMON_STATE_DIR, "daemon.sock")
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+DAEMON_WORKERS = 2               # Jumlah transfer paralel di daemon
+DAEMON_TOKEN_FILE = os.path.join(DAEMON_STATE_DIR, "daemon.token")  # Shared secret API daemon (dibuat otomatis, mode 0600)
+
+# Batch Scheduler Configuration
+BATCH_SCHEDULER = "fifo"         # "fifo" = urutan manifest, "makespan" = largest-first + sebar per host
+THROUGHPUT_HISTORY_FILE = os.path.join(DAEMON_STATE_DIR, "throughput.json")  # Riwayat throughput per host
+SCHEDULER_DEFAULT_THROUGHPUT = 20 * 1024**2  # Estimasi throughput host tanpa riwayat (bytes/s)
+
+# Download Engine Configuration
+DOWNLOAD_ENGINES = {             # Engine per platform atau host: hf_xet, hf_transfer, aria2, http, auto
+    'huggingface': 'hf_xet',
+    'civitai': 'aria2',
+    'other': 'aria2',
+    # 'cdn.example.com': 'http',
+}
+ENGINE_EXPLORATION_RATE = 0.1    # Peluang mode auto mencoba engine selain yang tercepat
+HTTP_DOWNLOAD_CHUNK_SIZE = 1024**2  # Ukuran chunk engine http in-process (bytes)
+
+# Multi-source Download Configuration (engine aria2)
+HOST_MIRRORS = {                 # Host -> base URL mirror dengan path yang sama (segmen dibagi ke semua sumber)
+    # 'huggingface.co': ['https://hf-mirror.com'],
+}
+ARIA2_SERVER_STAT_FILE = os.path.join(DAEMON_STATE_DIR, "aria2_server_stats.txt")  # Statistik per sumber (gabungan semua item)
+
+# HTTP Client Configuration (dipakai semua resolver & engine in-process)
+HTTP_CONNECT_TIMEOUT = 10        # Timeout koneksi (detik)
+HTTP_READ_TIMEOUT = 30           # Timeout baca (detik)
+HTTP_POOL_SIZE = 16              # Koneksi keep-alive maksimal per host
+HTTP_KEEPALIVE_IDLE = 60         # Detik idle sebelum TCP keep-alive probe
+DNS_CACHE_TTL = 300              # Lama cache hasil DNS (detik)
+DNS_CACHE_MAX_ENTRIES = 256      # Jumlah host maksimal di cache DNS
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+DEFAULT_HTTP_HEADERS = {
+    'User-Agent': BROWSER_USER_AGENT,
+    'Accept': 'application/octet-stream, */*',
+}
+# Header tambahan per host (berlaku juga untuk subdomain)
+HOST_HEADERS = {
+    'civitai.com': {'Referer': 'https://civitai.com/'},
+}
+# Host (berlaku juga untuk subdomain) yang boleh menerima token tiap platform
+CREDENTIAL_HOSTS = {
+    'huggingface': ('huggingface.co', 'hf.co'),
+    'civitai': ('civitai.com',),
+}
+
+# Retry Configuration (dipakai oleh semua HTTP call dan engine)
+RETRY_MAX_TRIES = 6             # Jumlah percobaan maksimal per request/transfer
+RETRY_BASE_DELAY = 2.0          # Delay awal backoff (detik)
+RETRY_MAX_DELAY = 120.0         # Batas atas delay backoff (detik)
+RETRY_AFTER_MAX = 600.0         # Batas atas Retry-After yang dihormati (detik)
+CIRCUIT_FAILURE_THRESHOLD = 5   # Jumlah kegagalan beruntun sebelum circuit host dibuka
+CIRCUIT_COOLDOWN = 60.0         # Lama circuit terbuka jika tidak ada Retry-After (detik)
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Exit code aria2c yang layak di-retry (timeout, network, DNS, HTTP error, server overload)
+ARIA2_RETRYABLE_EXIT_CODES = {2, 6, 19, 22, 29}
+
+# =============================================
+# RETRY POLICY & CIRCUIT BREAKER
+# =============================================
+
+class RetryableError(Exception):
+    """Error sementara yang boleh di-retry (429, 5xx, network error)"""
+
+    def __init__(self, message, status_code=None, retry_after=None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.response = response
+
+def parse_retry_after(value):
+    """Parse header Retry-After (detik atau HTTP-date) ke jumlah detik"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+class RetryPolicy:
+    """Exponential backoff dengan full jitter, menghormati Retry-After"""
+
+    def __init__(self, max_tries=RETRY_MAX_TRIES, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, retry_after_max=RETRY_AFTER_MAX):
+        self.max_tries = max_tries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_after_max = retry_after_max
+
+    def backoff(self, attempt, retry_after=None):
+        """Hitung delay sebelum percobaan berikutnya (attempt dimulai dari 1)"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(self.base_delay / 2, max(ceiling, self.base_delay / 2))
+        if retry_after is not None:
+            # Server minta menunggu: hormati, tambah sedikit jitter agar worker tidak serempak
+            delay = min(retry_after, self.retry_after_max) + random.uniform(0, self.base_delay)
+        return delay
+
+class CircuitBreaker:
+    """Circuit breaker per host: hentikan request sementara saat host throttling/error"""
+
+    def __init__(self, host, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def wait_time(self):
+        """Detik yang harus ditunggu sebelum boleh request ke host ini (0 = boleh)"""
+        with self.lock:
+            now = time.time()
+            if self.state == 'open':
+                if now < self.open_until:
+                    return self.open_until - now
+                self.state = 'half_open'
+                self.probe_in_flight = False
+            if self.state == 'half_open':
+                # Hanya satu request percobaan yang dilepas, sisanya menunggu hasilnya
+                if self.probe_in_flight:
+                    return 1.0
+                self.probe_in_flight = True
+            return 0.0
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """Hasil netral (error non-retryable): lepas slot percobaan tanpa mengubah state"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def record_failure(self, retry_after=None):
+        """Catat kegagalan; return True jika circuit baru saja dibuka"""
+        with self.lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            throttled = retry_after is not None
+            if self.state == 'half_open' or throttled or self.failures >= self.failure_threshold:
+                was_open = self.state == 'open'
+                self.state = 'open'
+                pause = retry_after if throttled else self.cooldown
+                self.open_until = max(self.open_until, time.time() + min(pause, RETRY_AFTER_MAX))
+                return not was_open
+            return False
+
+class RetryManager:
+    """Satu retry policy + circuit breaker per host untuk semua HTTP call dan engine"""
+
+    def __init__(self, policy=None):
+        self.policy = policy or RetryPolicy()
+        self.breakers = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _host(self, url_or_host):
+        if '://' in url_or_host:
+            return urlparse(url_or_host).netloc.lower()
+        return url_or_host.lower()
+
+    def breaker(self, host):
+        host = self._host(host)
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(host)
+                self.stats[host] = {'attempts': 0, 'retries': 0, 'throttled': 0,
+                                    'circuit_opens': 0, 'backoff_time': 0.0}
+            return self.breakers[host]
+
+    def _add_stat(self, host, key, value=1):
+        with self.lock:
+            self.stats[host][key] += value
+
+    def _sleep(self, host, seconds):
+        time.sleep(seconds)
+        self._add_stat(host, 'backoff_time', seconds)
+
+    def call(self, url_or_host, func, description="request"):
+        """Jalankan func() dengan retry; func raise RetryableError untuk error sementara"""
+        host = self._host(url_or_host)
+        breaker = self.breaker(host)
+
+        for attempt in range(1, self.policy.max_tries + 1):
+            wait = breaker.wait_time()
+            while wait > 0:
+                print(f"⏸️  Circuit {host} terbuka, menunggu {wait:.0f}s sebelum {description}...")
+                self._sleep(host, wait)
+                wait = breaker.wait_time()
+
+            self._add_stat(host, 'attempts')
+            try:
+                result = func()
+                breaker.record_success()
+                return result
+            except RetryableError as e:
+                if e.status_code == 429:
+                    self._add_stat(host, 'throttled')
+                if breaker.record_failure(e.retry_after):
+                    self._add_stat(host, 'circuit_opens')
+                if attempt >= self.policy.max_tries:
+                    raise
+                delay = self.policy.backoff(attempt, e.retry_after)
+                self._add_stat(host, 'retries')
+                print(f"🔁 {description} gagal ({e}), retry {attempt}/{self.policy.max_tries - 1} dalam {delay:.1f}s...")
+                self._sleep(host, delay)
+            except BaseException:
+                # 404/401/ValueError dll.: bukan sinyal kesehatan host, tapi probe half_open harus dilepas
+                breaker.release_probe()
+                raise
+
+    def request(self, method, url, send=None, **kwargs):
+        """Request dengan retry; return response terakhir jika retry habis"""
+        send = send or requests.request
+
+        def attempt():
+            try:
+                response = send(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise RetryableError(f"{type(e).__name__}: {e}")
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                # Lepas koneksi ke pool sebelum retry (penting untuk stream=True); status &
+                # header tetap bisa dibaca jika response ini akhirnya dikembalikan
+                response.close()
+                raise RetryableError(
+                    f"HTTP {response.status_code}",
+                    status_code=response.status_code,
+                    retry_after=parse_retry_after(response.headers.get('Retry-After')),
+                    response=response
+                )
+            return response
+
+        try:
+            return self.call(url, attempt, f"{method} {self._host(url)}")
+        except RetryableError as e:
+            if e.response is not None:
+                return e.response
+            raise requests.ConnectionError(str(e))
+
+    def total_backoff_time(self):
+        with self.lock:
+            return sum(s['backoff_time'] for s in self.stats.values())
+
+    def snapshot(self):
+        """Salinan statistik per host yang aman dibaca selagi worker masih berjalan"""
+        with self.lock:
+            return {host: dict(stats) for host, stats in self.stats.items()}
+
+    def print_stats(self):
+        """Tampilkan statistik retry/backoff per host"""
+        with self.lock:
+            hosts = {h: dict(s) for h, s in self.stats.items() if s['retries'] or s['backoff_time']}
+        if not hosts:
+            return
+        print("\n🔁 RETRY & BACKOFF PER HOST:")
+        for host, s in hosts.items():
+            print(f"   {host}: {s['retries']} retry, {s['throttled']}x 429, "
+                  f"{s['circuit_opens']}x circuit open, backoff {s['backoff_time']:.1f}s")
+
+RETRY_MANAGER = RetryManager()
+
+# =============================================
+# PROFILING
+# =============================================
+
+class PhaseProfiler:
+    """Catat durasi tiap fase download per item; output tabel + Chrome trace-event JSON"""
+
+    def __init__(self, use_cprofile=False):
+        self.enabled = True
+        self.use_cprofile = use_cprofile
+        self.origin = time.perf_counter()
+        self.events = []
+        self.profiles = []
+        self.active_profile = None
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, item=None):
+        """Context manager untuk mengukur satu fase (thread-safe, boleh nested)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            with self.lock:
+                self.events.append({
+                    'name': name, 'item': item, 'start': start - self.origin, 'end': end - self.origin,
+                    'tid': thread.ident, 'thread': thread.name,
+                })
+
+    def start_cprofile(self):
+        """
+        Mulai satu cProfile untuk seluruh command jika diaktifkan
+
+        Sengaja tidak per thread download: di Python >= 3.12 hanya satu profiler
+        yang boleh aktif dalam satu proses.
+
+        Returns:
+            bool: True jika cProfile baru dimulai oleh panggilan ini
+        """
+        if not self.use_cprofile or self.active_profile is not None:
+            return False
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Profiler lain sudah aktif: lanjut tanpa cProfile daripada menggagalkan run
+            print(f"⚠️ cProfile tidak bisa diaktifkan: {e}")
+            return False
+        self.active_profile = profile
+        return True
+
+    def stop_cprofile(self):
+        if self.active_profile is None:
+            return
+        self.active_profile.disable()
+        with self.lock:
+            self.profiles.append(self.active_profile)
+        self.active_profile = None
+
+    @contextmanager
+    def cprofile_scope(self):
+        """Jalankan blok di bawah cProfile (lihat start_cprofile)"""
+        started = self.start_cprofile()
+        try:
+            yield
+        finally:
+            if started:
+                self.stop_cprofile()
+
+    def summary(self):
+        """Agregasi per fase: {fase: {'count', 'total', 'max'}}"""
+        phases = {}
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            duration = event['end'] - event['start']
+            stats = phases.setdefault(event['name'], {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+        return phases
+
+    def print_report(self):
+        """Tampilkan tabel breakdown waktu per fase dan per item"""
+        phases = self.summary()
+        if not phases:
+            return
+        print("\n⏱️  PROFILE PER FASE:")
+        print(f"   {'Fase':<20} {'Jumlah':>7} {'Total':>10} {'Rata-rata':>10} {'Maks':>10}")
+        for name, stats in sorted(phases.items(), key=lambda item: -item[1]['total']):
+            mean = stats['total'] / stats['count']
+            print(f"   {name:<20} {stats['count']:>7} {stats['total']:>9.2f}s {mean:>9.2f}s {stats['max']:>9.2f}s")
+
+        with self.lock:
+            items = {}
+            for event in self.events:
+                if event['item'] and event['name'] != 'download_file':
+                    items.setdefault(event['item'], {}).setdefault(event['name'], 0.0)
+                    items[event['item']][event['name']] += event['end'] - event['start']
+        if len(items) > 1:
+            print("\n⏱️  PROFILE PER ITEM:")
+            for item, item_phases in items.items():
+                breakdown = ', '.join(f"{name} {seconds:.1f}s" for name, seconds in
+                                      sorted(item_phases.items(), key=lambda entry: -entry[1]))
+                print(f"   {item[:60]}: {breakdown}")
+
+        if self.profiles:
+            print("\n🧪 cProfile (top 20 cumulative):")
+            stats = pstats.Stats(*self.profiles, stream=sys.stdout)
+            stats.sort_stats('cumulative').print_stats(20)
+
+    def chrome_trace(self):
+        """Bangun trace-event format (buka di chrome://tracing atau Perfetto)"""
+        pid = os.getpid()
+        trace_events = []
+        threads = {}
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            threads[event['tid']] = event['thread']
+            trace_events.append({
+                'name': event['name'], 'cat': 'download', 'ph': 'X', 'pid': pid, 'tid': event['tid'],
+                'ts': event['start'] * 1e6, 'dur': (event['end'] - event['start']) * 1e6,
+                'args': {'item': event['item']} if event['item'] else {},
+            })
+        for tid, name in threads.items():
+            trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        print(f"📄 Trace JSON disimpan: {path}")
+
+    def write_cprofile(self, path):
+        if self.profiles:
+            pstats.Stats(*self.profiles).dump_stats(path)
+            print(f"📄 cProfile stats disimpan: {path}")
+
+class _NullProfiler:
+    """Profiler no-op saat mode profile tidak aktif"""
+    enabled = False
+
+    def phase(self, name, item=None):
+        return nullcontext()
+
+    def cprofile_scope(self):
+        return nullcontext()
+
+    def start_cprofile(self):
+        return False
+
+    def stop_cprofile(self):
+        pass
+
+PROFILER = _NullProfiler()
+
+def enable_profiling(use_cprofile=False):
+    """Aktifkan PhaseProfiler global (dipakai oleh semua UniversalDownloader baru)"""
+    global PROFILER
+    PROFILER = PhaseProfiler(use_cprofile)
+    return PROFILER
+
+# =============================================
+# POOLED HTTP CLIENT
+# =============================================
+
+def host_headers(url_or_host):
+    """Header default untuk satu host: DEFAULT_HTTP_HEADERS + HOST_HEADERS yang cocok"""
+    host = urlparse(url_or_host).netloc.lower() if '://' in url_or_host else url_or_host.lower()
+    headers = dict(DEFAULT_HTTP_HEADERS)
+    for suffix, extra in HOST_HEADERS.items():
+        if host == suffix or host.endswith('.' + suffix):
+            headers.update(extra)
+    return headers
+
+class DNSCache:
+    """Cache hasil resolve host dengan TTL, hanya dipakai koneksi pool HTTP_CLIENT"""
+
+    def __init__(self, ttl=DNS_CACHE_TTL, max_entries=DNS_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """Daftar sockaddr untuk (host, port); raise socket.gaierror seperti getaddrinfo"""
+        key = (host, port)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        addresses = [info[4] for info in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)]
+        with self.lock:
+            self.misses += 1
+            self.entries.pop(key, None)
+            if len(self.entries) >= self.max_entries:
+                # Buang yang kadaluarsa dulu, lalu entry tertua
+                for stale in [k for k, (expires, _) in self.entries.items() if expires <= now]:
+                    del self.entries[stale]
+                while len(self.entries) >= self.max_entries:
+                    del self.entries[next(iter(self.entries))]
+            self.entries[key] = (now + self.ttl, addresses)
+        return addresses
+
+    def invalidate(self, host, port):
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+DNS_CACHE = DNSCache()
+
+class _CachedDNSConnectionMixin:
+    """Koneksi urllib3 yang resolve host lewat DNS_CACHE, tanpa menyentuh socket.getaddrinfo global"""
+
+    def _new_conn(self):
+        try:
+            addresses = DNS_CACHE.resolve(self.host, self.port)
+        except OSError:
+            # Biarkan urllib3 sendiri yang membentuk error resolusi nama
+            return super()._new_conn()
+        error = None
+        for address in addresses:
+            try:
+                return urllib3_connection.create_connection(
+                    address[:2], self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options,
+                )
+            except socket.timeout:
+                error = ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})")
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection: {e}")
+        # Semua alamat gagal: alamat cache mungkin basi, resolve ulang di percobaan berikutnya
+        DNS_CACHE.invalidate(self.host, self.port)
+        raise error
+
+class _CachedDNSHTTPConnection(_CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+class _CachedDNSHTTPSConnection(_CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+class _CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+class _CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter dengan TCP keep-alive dan DNS cache supaya koneksi idle tidak diputus NAT/LB"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        socket_options = list(HTTPConnection.default_socket_options)
+        socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        for option, value in (('TCP_KEEPIDLE', HTTP_KEEPALIVE_IDLE), ('TCP_KEEPINTVL', 15), ('TCP_KEEPCNT', 4)):
+            if hasattr(socket, option):
+                socket_options.append((socket.IPPROTO_TCP, getattr(socket, option), value))
+        kwargs['socket_options'] = socket_options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CachedDNSHTTPConnectionPool,
+            'https': _CachedDNSHTTPSConnectionPool,
+        }
+
+class HttpClient:
+    """Satu client HTTP bersama: Session per host, DNS cache, keep-alive, timeout terpusat"""
+
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 pool_size=HTTP_POOL_SIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.sessions = {}
+        self.request_counts = {}
+        self.lock = threading.Lock()
+        self.dns_cache = DNS_CACHE
+
+    def session_for(self, url_or_host, api=False):
+        """
+        Session (connection pool) untuk satu host, dibuat saat pertama dipakai
+
+        Args:
+            url_or_host: URL atau host
+            api: Session terpisah tanpa header download (User-Agent browser, Accept
+                octet-stream), untuk library lain seperti huggingface_hub
+        """
+        host = urlparse(url_or_host).netloc.lower() if '://' in url_or_host else url_or_host.lower()
+        key = f"{host} (api)" if api else host
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = _KeepAliveAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                if not api:
+                    session.headers.update(host_headers(host))
+                # Hitung request yang benar-benar dikirim (termasuk redirect), bukan lookup session
+                session.hooks['response'].append(lambda response, *args, **kwargs: self._count_request(key))
+                self.sessions[key] = session
+                self.request_counts[key] = 0
+            return session
+
+    def _count_request(self, key):
+        with self.lock:
+            self.request_counts[key] += 1
+
+    def send(self, method, url, **kwargs):
+        """Satu request tanpa retry lewat session host (dipakai RetryManager)"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session_for(url).request(method, url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Request dengan retry policy bersama"""
+        return RETRY_MANAGER.request(method, url, send=self.send, **kwargs)
+
+    def stats(self):
+        """Statistik reuse koneksi per host: request vs koneksi TCP/TLS baru"""
+        with self.lock:
+            sessions = dict(self.sessions)
+            counts = dict(self.request_counts)
+        result = {}
+        for host, session in sessions.items():
+            connections = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+            requests_made = counts.get(host, 0)
+            result[host] = {
+                'requests': requests_made,
+                'connections': connections,
+                'reused': max(0, requests_made - connections),
+            }
+        return {'hosts': result, 'dns_hits': self.dns_cache.hits, 'dns_misses': self.dns_cache.misses}
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats['hosts']:
+            return
+        print("\n🔌 KONEKSI HTTP:")
+        for host, s in stats['hosts'].items():
+            reuse = s['reused'] / s['requests'] * 100 if s['requests'] else 0
+            print(f"   {host}: {s['requests']} request, {s['connections']} koneksi baru ({reuse:.0f}% reuse)")
+        print(f"   DNS cache: {stats['dns_hits']} hit / {stats['dns_misses']} miss")
+
+HTTP_CLIENT = HttpClient()
+
+def http_request(method, url, **kwargs):
+    """Entry point HTTP bersama: pooled session per host + retry policy"""
+    return HTTP_CLIENT.request(method, url, **kwargs)
+
+# =============================================
+# PROGRESS RENDERER
+# =============================================
+
+ARIA2_READOUT_PATTERN = re.compile(
+    r'\[#\w+\s+([\d.]+)([KMGT]?i?B)/([\d.]+)([KMGT]?i?B)(?:\((\d+)%\))?.*?DL:([\d.]+)([KMGT]?i?B)'
+)
+
+def parse_size(value, unit):
+    """Parse ukuran human-readable aria2 (mis. 1.2 GiB) ke bytes"""
+    multipliers = {'B': 1, 'KIB': 1024, 'MIB': 1024**2, 'GIB': 1024**3, 'TIB': 1024**4}
+    return int(float(value) * multipliers.get(unit.upper(), 1))
+
+class _RendererStream:
+    """Pengganti sys.stdout selama renderer aktif: semua print diantrekan ke renderer"""
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+    def write(self, text):
+        if text:
+            self.renderer.events.put(('log', text))
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+class ProgressRenderer:
+    """
+    Satu thread renderer yang menggabungkan progress semua engine jadi tampilan ringkas.
+    sys.stdout hanya dialihkan jika capture_stdout (mode CLI); sebagai library, renderer
+    cukup menulis baris log berkala supaya output ComfyUI/pemanggil tidak terganggu.
+    """
+
+    def __init__(self, downloader, stream=None, refresh_interval=PROGRESS_REFRESH_INTERVAL,
+                 log_interval=PROGRESS_LOG_INTERVAL, max_rows=PROGRESS_MAX_ROWS, capture_stdout=None):
+        self.downloader = downloader
+        self.stream = stream or sys.stdout
+        self.capture_stdout = PROGRESS_CAPTURE_STDOUT if capture_stdout is None else capture_stdout
+        # Redraw multi-baris hanya aman jika semua print lewat renderer
+        self.is_tty = self.capture_stdout and hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.refresh_interval = refresh_interval if self.is_tty else log_interval
+        self.max_rows = max_rows
+        self.events = queue.Queue()
+        self.items = {}
+        self.finished = {'count': 0, 'downloaded': 0, 'total': 0}
+        self.drawn_lines = 0
+        self.pending_log = ''
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.render_lock = threading.Lock()
+        self.original_stdout = None
+
+    def start(self):
+        """Mulai thread renderer (dan alihkan stdout ke antrean renderer jika capture_stdout)"""
+        if self.capture_stdout:
+            self.original_stdout = sys.stdout
+            sys.stdout = _RendererStream(self)
+        self.thread = threading.Thread(target=self._run, name='progress-renderer', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Hentikan renderer, flush log tersisa dan kembalikan stdout"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        if self.original_stdout is not None:
+            sys.stdout = self.original_stdout
+            self.original_stdout = None
+
+    @contextmanager
+    def paused(self):
+        """
+        Tahan redraw selama prompt input(): log tertunda ditulis, blok progress dihapus,
+        dan stdout asli dipakai supaya prompt tidak masuk antrean renderer
+        """
+        with self.render_lock:
+            self._drain()
+            if self.is_tty and self.drawn_lines:
+                self.stream.write(f"\x1b[{self.drawn_lines}F\x1b[J")
+                self.drawn_lines = 0
+            self._flush_log()
+            captured = None
+            if self.original_stdout is not None:
+                captured, sys.stdout = sys.stdout, self.original_stdout
+            try:
+                yield
+            finally:
+                if captured is not None:
+                    sys.stdout = captured
+
+    def update(self, item_id, **fields):
+        """Kirim event progress (name, downloaded, total, speed, status) untuk satu item"""
+        self.events.put(('progress', item_id, fields, time.time()))
+
+    def _apply(self, event):
+        _, item_id, fields, timestamp = event
+        item = self.items.setdefault(item_id, {
+            'name': str(item_id), 'downloaded': 0, 'total': None, 'speed': None,
+            'status': 'active', 'started': timestamp, 'last_bytes': 0, 'last_time': timestamp,
+        })
+        item.update({key: value for key, value in fields.items() if value is not None})
+        if fields.get('status') == 'done' and item['total']:
+            item['downloaded'] = max(item['downloaded'], item['total'])
+        if item['status'] in ('done', 'failed'):
+            # Item selesai dilipat ke agregat supaya memori renderer tidak tumbuh
+            self.finished['count'] += 1
+            self.finished['downloaded'] += item['downloaded']
+            self.finished['total'] += item['total'] or item['downloaded']
+            del self.items[item_id]
+        if 'downloaded' in fields and fields.get('speed') is None:
+            elapsed = timestamp - item['last_time']
+            if elapsed >= 1.0:
+                item['speed'] = max(0, item['downloaded'] - item['last_bytes']) / elapsed
+                item['last_bytes'] = item['downloaded']
+                item['last_time'] = timestamp
+
+    def _drain(self):
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+            if event[0] == 'log':
+                self.pending_log += event[1]
+            else:
+                self._apply(event)
+
+    def _run(self):
+        last_render = 0.0
+        while not self.stop_event.is_set():
+            self.stop_event.wait(PROGRESS_TICK)
+            with self.render_lock:
+                self._drain()
+                now = time.time()
+                if self.is_tty:
+                    # Log ditampilkan segera di atas blok progress
+                    if self.pending_log or now - last_render >= self.refresh_interval:
+                        self._render_tty()
+                        last_render = now
+                else:
+                    self._flush_log()
+                    if now - last_render >= self.refresh_interval and self._active_items():
+                        self._render_log_line()
+                        last_render = now
+        self._drain()
+        if self.is_tty:
+            self._render_tty(final=True)
+        else:
+            self._flush_log()
+            self._render_log_line()
+
+    def _active_items(self):
+        return [item for item in self.items.values() if item['status'] == 'active']
+
+    def _totals(self):
+        downloaded = self.finished['downloaded'] + sum(item['downloaded'] for item in self.items.values())
+        known_total = self.finished['total'] + sum(item['total'] or item['downloaded']
+                                                   for item in self.items.values())
+        speed = sum(item['speed'] or 0 for item in self._active_items())
+        remaining = max(0, known_total - downloaded)
+        eta = remaining / speed if speed > 0 else None
+        return downloaded, known_total, speed, eta, self.finished['count']
+
+    def _has_items(self):
+        return bool(self.items) or self.finished['count'] > 0
+
+    def _item_line(self, item):
+        total = item['total']
+        percent = f"{item['downloaded'] / total * 100:5.1f}%" if total else "  ?  "
+        size = f"{self.downloader.format_bytes(item['downloaded'])}/{self.downloader.format_bytes(total) if total else '?'}"
+        speed = f"{self.downloader.format_bytes(item['speed'])}/s" if item['speed'] else "-"
+        return f"  {item['name'][:40]:<40} {percent} {size:>22} {speed:>12}"
+
+    def _summary_line(self):
+        downloaded, known_total, speed, eta, done = self._totals()
+        eta_text = self.downloader.format_time(eta) if eta is not None else '-'
+        return (f"📦 {done}/{done + len(self.items)} selesai | {self.downloader.format_bytes(downloaded)}/{self.downloader.format_bytes(known_total)} | "
+                f"🚄 {self.downloader.format_bytes(speed)}/s | ETA {eta_text}")
+
+    def _flush_log(self):
+        if self.pending_log:
+            self.stream.write(self.pending_log)
+            self.pending_log = ''
+            self.stream.flush()
+
+    def _render_tty(self, final=False):
+        out = []
+        if self.drawn_lines:
+            # Naik ke awal blok progress sebelumnya lalu hapus sampai akhir layar
+            out.append(f"\x1b[{self.drawn_lines}F\x1b[J")
+        if self.pending_log:
+            out.append(self.pending_log if self.pending_log.endswith('\n') else self.pending_log + '\n')
+            self.pending_log = ''
+
+        lines = []
+        if self._has_items() and not final:
+            active = self._active_items()
+            lines = [self._item_line(item) for item in active[:self.max_rows]]
+            if len(active) > self.max_rows:
+                lines.append(f"  ... +{len(active) - self.max_rows} transfer lain")
+            lines.append(self._summary_line())
+        elif self._has_items():
+            lines.append(self._summary_line())
+        out.extend(line + '\n' for line in lines)
+        self.drawn_lines = 0 if final else len(lines)
+
+        self.stream.write(''.join(out))
+        self.stream.flush()
+
+    def _render_log_line(self):
+        if not self._has_items():
+            return
+        active = ', '.join(f"{item['name'][:30]} {item['downloaded'] / item['total'] * 100:.0f}%"
+                           if item['total'] else item['name'][:30] for item in self._active_items()[:self.max_rows])
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.stream.write(f"[{timestamp}] {self._summary_line()}" + (f" | {active}" if active else "") + "\n")
+        self.stream.flush()
+
+def enable_stdout_capture():
+    """Mode CLI: ProgressRenderer mengambil alih sys.stdout selama transfer berjalan"""
+    global PROGRESS_CAPTURE_STDOUT
+    PROGRESS_CAPTURE_STDOUT = True
+
+# =============================================
+# TIERED STORAGE (STAGING -> VOLUME)
+# =============================================
+
+class TieredStorage:
+    """
+    Download ditulis ke scratch lokal (NVMe) lalu dipindah ke network volume di background.
+    Selama migrasi, path ComfyUI berupa symlink ke file staging; setelah selesai diganti
+    file asli secara atomic. Journal di staging_dir membuat migrasi bisa dilanjutkan.
+    """
+
+    def __init__(self, staging_dir, rate_limit=MIGRATION_RATE_LIMIT, chunk_size=MIGRATION_CHUNK_SIZE,
+                 max_tries=MIGRATION_MAX_TRIES):
+        self.staging_dir = os.path.abspath(os.path.expanduser(staging_dir))
+        self.journal_path = os.path.join(self.staging_dir, 'migrations.json')
+        self.rate_limit = rate_limit
+        self.chunk_size = chunk_size
+        self.retry_policy = RetryPolicy(max_tries=max_tries)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.idle = threading.Event()
+        self.idle.set()
+        os.makedirs(self.staging_dir, exist_ok=True)
+        threading.Thread(target=self._worker, name='tier-migrator', daemon=True).start()
+        self.resume()
+
+    def staging_directory_for(self, directory):
+        """Direktori staging yang mencerminkan direktori tujuan"""
+        return os.path.join(self.staging_dir, os.path.abspath(directory).lstrip(os.sep))
+
+    def has_space(self, size):
+        """Cek apakah staging cukup untuk file berukuran size (None = tidak diketahui, anggap cukup)"""
+        if not size:
+            return True
+        return shutil.disk_usage(self.staging_dir).free > size * 1.05
+
+    def _save_journal(self):
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.pending.values()), f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+    def _link(self, staged_path, final_path):
+        """Pasang symlink final_path -> staged_path secara atomic; return False jika final_path file asli"""
+        if os.path.exists(final_path) and not os.path.islink(final_path):
+            # Jangan ganti model yang sudah ada di volume dengan symlink ke scratch
+            return False
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        tmp_link = final_path + '.staging-link'
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(staged_path, tmp_link)
+        os.replace(tmp_link, final_path)
+        return True
+
+    def register(self, staged_path, final_path):
+        """File staging siap dipakai: pasang symlink di path ComfyUI dan antrekan migrasi"""
+        linked = self._link(staged_path, final_path)
+        with self.lock:
+            # linked + size: saat resume, file asli di final_path hanya dianggap hasil migrasi ini
+            # jika final sempat jadi symlink ke staging dan ukurannya sama
+            self.pending[final_path] = {'staged': staged_path, 'final': final_path, 'queued': time.time(),
+                                        'linked': linked, 'size': os.path.getsize(staged_path)}
+            self._save_journal()
+            self.idle.clear()
+            self.queue.put(final_path)
+        if linked:
+            print(f"🗂️  File aktif dari staging, migrasi ke volume diantrekan: {os.path.basename(final_path)}")
+        else:
+            print(f"🗂️  File lama tetap dipakai sampai migrasi ke volume selesai: {os.path.basename(final_path)}")
+
+    def resume(self):
+        """Lanjutkan migrasi yang tertunda dari journal (setelah restart)"""
+        if not os.path.exists(self.journal_path):
+            return 0
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Journal migrasi tidak bisa dibaca: {e}")
+            return 0
+
+        resumed = 0
+        with self.lock:
+            for entry in entries:
+                staged, final = entry['staged'], entry['final']
+                if not os.path.exists(staged):
+                    # Staging sudah dihapus: migrasi sebelumnya selesai setelah replace
+                    continue
+                if os.path.exists(final) and not os.path.islink(final):
+                    if entry.get('linked') and os.path.getsize(final) == entry.get('size'):
+                        # Migrasi sudah me-replace symlink tapi belum sempat menghapus staging
+                        os.remove(staged)
+                        continue
+                    # File lama di volume: download pengganti di staging belum dimigrasi
+                else:
+                    self._link(staged, final)
+                self.pending[final] = entry
+                self.idle.clear()
+                self.queue.put(final)
+                resumed += 1
+            self._save_journal()
+        if resumed:
+            print(f"♻️  {resumed} migrasi staging dilanjutkan")
+        return resumed
+
+    def _copy_throttled(self, source, destination):
+        """Copy dengan rate limit; lanjut dari offset file tujuan jika sudah ada sebagian"""
+        total = os.path.getsize(source)
+        offset = os.path.getsize(destination) if os.path.exists(destination) else 0
+        if offset > total:
+            offset = 0
+        with open(source, 'rb') as src, open(destination, 'r+b' if offset else 'wb') as dst:
+            src.seek(offset)
+            dst.seek(offset)
+            dst.truncate(offset)
+            window_start, window_bytes = time.time(), 0
+            while True:
+                chunk = src.read(self.chunk_size)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                THROTTLE.pace(len(chunk))
+                window_bytes += len(chunk)
+                if self.rate_limit:
+                    expected = window_bytes / self.rate_limit
+                    elapsed = time.time() - window_start
+                    if expected > elapsed:
+                        time.sleep(expected - elapsed)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+    def _migrate(self, final_path):
+        with self.lock:
+            entry = self.pending.get(final_path)
+        if entry is None:
+            return
+        staged = entry['staged']
+        partial = final_path + '.migrating'
+        start_time = time.time()
+        try:
+            self._copy_throttled(staged, partial)
+            if os.path.getsize(partial) != os.path.getsize(staged):
+                raise IOError(f"ukuran hasil migrasi tidak cocok untuk {final_path}")
+        except BaseException:
+            # Partial gagal tidak dipakai lagi: percobaan berikutnya copy dari awal
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        # Ganti symlink dengan file asli secara atomic, volume jadi lokasi authoritative
+        os.replace(partial, final_path)
+        os.remove(staged)
+        with self.lock:
+            self.pending.pop(final_path, None)
+            self._save_journal()
+        print(f"✅ Migrasi selesai: {os.path.basename(final_path)} ({time.time() - start_time:.1f}s)")
+
+    def _migrate_with_retry(self, final_path):
+        """Migrasi dengan backoff; setelah percobaan habis entry tetap di journal untuk resume"""
+        for attempt in range(1, self.retry_policy.max_tries + 1):
+            try:
+                self._migrate(final_path)
+                return True
+            except Exception as e:
+                # Thread migrator cuma satu: error apa pun tidak boleh menghentikannya
+                if attempt == self.retry_policy.max_tries:
+                    print(f"❌ Migrasi gagal ({final_path}): {e} — akan dicoba lagi saat resume")
+                    return False
+                delay = self.retry_policy.backoff(attempt)
+                print(f"⚠️ Migrasi gagal ({final_path}): {e} — coba lagi dalam {delay:.1f}s "
+                      f"({attempt}/{self.retry_policy.max_tries})")
+                time.sleep(delay)
+
+    def _worker(self):
+        while True:
+            final_path = self.queue.get()
+            try:
+                self._migrate_with_retry(final_path)
+            finally:
+                with self.lock:
+                    self.queue.task_done()
+                    if self.queue.unfinished_tasks == 0:
+                        self.idle.set()
+
+    def wait(self):
+        """Tunggu semua migrasi di antrean selesai"""
+        if self.pending:
+            print(f"⏳ Menunggu {len(self.pending)} migrasi ke volume...")
+        self.idle.wait()
+
+_TIERED_STORAGE = {}
+
+def get_tiered_storage(staging_dir=None):
+    """Satu TieredStorage per direktori staging per proses (None jika staging nonaktif)"""
+    staging_dir = staging_dir or STAGING_DIR
+    if not staging_dir:
+        return None
+    if staging_dir not in _TIERED_STORAGE:
+        _TIERED_STORAGE[staging_dir] = TieredStorage(staging_dir)
+    return _TIERED_STORAGE[staging_dir]
+
+# =============================================
+# INFERENCE-AWARE THROTTLING
+# =============================================
+
+def can_restore_nice(nice):
+    """Apakah proses ini boleh menurunkan nice kembali ke `nice` (CAP_SYS_NICE atau RLIMIT_NICE cukup)"""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('CapEff:'):
+                    if int(line.split()[1], 16) & (1 << 23):  # CAP_SYS_NICE
+                        return True
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NICE)
+    except (ImportError, AttributeError, OSError, ValueError):
+        return False
+    # RLIMIT_NICE r mengizinkan nice serendah 20 - r
+    return soft == resource.RLIM_INFINITY or 20 - soft <= nice
+
+class InferenceThrottle:
+    """
+    Mengalah ke ComfyUI selama prompt dieksekusi
+
+    Sinyal busy dibaca dari callback, file flag, atau endpoint /queue ComfyUI. Saat
+    busy: proses aria2 di-ionice idle (dan di-renice jika nice awal bisa dipulihkan)
+    serta dijalankan bergantian dengan SIGSTOP/SIGCONT (duty cycle), writer in-process
+    dibatasi ke `rate`, dan transfer hf_hub_download (tidak bisa di-pace) ditunda sampai idle.
+    """
+    enabled = True
+
+    def __init__(self, comfyui_url=COMFYUI_URL, flag_file=INFERENCE_FLAG_FILE, callback=None,
+                 interval=INFERENCE_POLL_INTERVAL, rate=INFERENCE_THROTTLED_RATE,
+                 duty_cycle=INFERENCE_DUTY_CYCLE):
+        self.comfyui_url = comfyui_url.rstrip('/')
+        self.flag_file = flag_file
+        self.callback = callback
+        self.interval = interval
+        self.rate = rate
+        self.duty_cycle = duty_cycle
+        self.busy = False
+        self.busy_since = None
+        self.busy_time = 0.0
+        self.busy_count = 0
+        self.idle_event = threading.Event()
+        self.idle_event.set()
+        self.stop_event = threading.Event()
+        self.processes = set()
+        self.original_nice = {}  # pid -> nice sebelum di-renice
+        self.lock = threading.Lock()
+        self.bucket_start = time.time()
+        self.bucket_bytes = 0
+        self.thread = None
+
+    def is_busy(self):
+        """Baca sinyal busy sekali: callback > file flag > /queue ComfyUI"""
+        if self.callback is not None:
+            return bool(self.callback())
+        if self.flag_file:
+            return os.path.exists(self.flag_file)
+        try:
+            response = HTTP_CLIENT.send('GET', f"{self.comfyui_url}/queue", timeout=2)
+            return bool(response.json().get('queue_running'))
+        except (requests.RequestException, ValueError):
+            # ComfyUI tidak jalan / tidak terjangkau: anggap idle
+            return False
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='inference-throttle', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.busy:
+            self._set_busy(False)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            busy = self.is_busy()
+            if busy != self.busy:
+                self._set_busy(busy)
+            if busy:
+                self._duty_cycle()
+            else:
+                self.stop_event.wait(self.interval)
+
+    def _duty_cycle(self):
+        """Satu periode polling: aria2 jalan duty_cycle x interval, sisanya dihentikan"""
+        run_time = self.interval * self.duty_cycle
+        self._signal_all(getattr(signal, 'SIGCONT', None))
+        self.stop_event.wait(run_time)
+        if self.duty_cycle < 1:
+            self._signal_all(getattr(signal, 'SIGSTOP', None))
+            self.stop_event.wait(self.interval - run_time)
+
+    def _set_busy(self, busy):
+        with self.lock:
+            self.busy = busy
+            processes = list(self.processes)
+        if busy:
+            self.busy_since = time.time()
+            self.busy_count += 1
+            self.idle_event.clear()
+            print("\n⏳ ComfyUI sedang mengeksekusi prompt: transfer diperlambat")
+        else:
+            self.busy_time += time.time() - (self.busy_since or time.time())
+            self.busy_since = None
+            self.idle_event.set()
+            self._signal_all(getattr(signal, 'SIGCONT', None))
+            print("\n▶️  ComfyUI idle: transfer kembali full speed")
+        for process in processes:
+            self._set_priority(process, busy)
+
+    def _signal_all(self, signum):
+        if signum is None:
+            return
+        with self.lock:
+            processes = list(self.processes)
+        for process in processes:
+            if process.poll() is None:
+                try:
+                    process.send_signal(signum)
+                except OSError:
+                    pass
+
+    def _set_priority(self, process, low):
+        """ionice idle (+ nice 19 jika bisa dipulihkan) saat busy, kembali ke semula saat idle"""
+        if process.poll() is not None:
+            return
+        try:
+            if low:
+                original = os.getpriority(os.PRIO_PROCESS, process.pid)
+                # Tanpa izin menurunkan nice lagi, aria2 akan tertahan di nice 19 sampai selesai
+                if original < 19 and can_restore_nice(original):
+                    os.setpriority(os.PRIO_PROCESS, process.pid, 19)
+                    with self.lock:
+                        self.original_nice[process.pid] = original
+            else:
+                with self.lock:
+                    original = self.original_nice.pop(process.pid, None)
+                if original is not None:
+                    os.setpriority(os.PRIO_PROCESS, process.pid, original)
+        except (AttributeError, OSError):
+            pass
+        if shutil.which('ionice'):
+            io_class = ['-c', '3'] if low else ['-c', '2', '-n', '4']
+            subprocess.run(['ionice'] + io_class + ['-p', str(process.pid)], capture_output=True)
+
+    def attach(self, process):
+        """Daftarkan subprocess transfer (aria2) agar ikut di-throttle"""
+        with self.lock:
+            self.processes.add(process)
+            busy = self.busy
+        if busy:
+            self._set_priority(process, True)
+
+    def detach(self, process):
+        with self.lock:
+            self.processes.discard(process)
+            self.original_nice.pop(process.pid, None)
+        # Proses yang sedang di-SIGSTOP tidak akan memproses SIGTERM
+        if process.poll() is None and hasattr(signal, 'SIGCONT'):
+            try:
+                process.send_signal(signal.SIGCONT)
+            except OSError:
+                pass
+
+    def pace(self, nbytes):
+        """Dipanggil writer in-process per chunk; tidur supaya total rate <= self.rate saat busy"""
+        if not self.busy:
+            return
+        with self.lock:
+            now = time.time()
+            if now - self.bucket_start > 1.0 and self.bucket_bytes <= self.rate * (now - self.bucket_start):
+                self.bucket_start, self.bucket_bytes = now, 0
+            self.bucket_bytes += nbytes
+            delay = self.bucket_bytes / self.rate - (now - self.bucket_start)
+        if delay > 0:
+            time.sleep(delay)
+
+    def wait_idle(self, description, timeout=INFERENCE_MAX_DEFER):
+        """Tunda transfer yang tidak bisa di-pace sampai ComfyUI idle (maks timeout detik)"""
+        if self.busy:
+            print(f"⏸️  Menunda {description} sampai ComfyUI idle...")
+            if not self.idle_event.wait(timeout):
+                print(f"⚠️ ComfyUI masih busy setelah {timeout:.0f}s, {description} tetap dijalankan")
+
+    def print_stats(self):
+        busy_time = self.busy_time + (time.time() - self.busy_since if self.busy_since else 0)
+        if self.busy_count:
+            print(f"\n⏳ Mengalah ke ComfyUI: {self.busy_count}x, total {busy_time:.0f}s")
+
+class _NullThrottle:
+    """Throttle no-op saat mode inference-aware tidak aktif"""
+    enabled = False
+    busy = False
+
+    def attach(self, process):
+        pass
+
+    def detach(self, process):
+        pass
+
+    def pace(self, nbytes):
+        pass
+
+    def wait_idle(self, description, timeout=None):
+        pass
+
+    def stop(self):
+        pass
+
+    def print_stats(self):
+        pass
+
+THROTTLE = _NullThrottle()
+
+def enable_inference_throttle(comfyui_url=None, flag_file=None, callback=None):
+    """Aktifkan InferenceThrottle global (dipakai aria2, writer in-process, dan HF)"""
+    global THROTTLE
+    THROTTLE.stop()
+    THROTTLE = InferenceThrottle(comfyui_url or COMFYUI_URL,
+                                 INFERENCE_FLAG_FILE if flag_file is None else flag_file,
+                                 callback).start()
+    return THROTTLE
+
+# =============================================
+# BATCH SCHEDULER (MAKESPAN)
+# =============================================
+
+class ThroughputHistory:
+    """Riwayat throughput per host (EWMA bytes/s), disimpan di JSON antar sesi"""
+
+    def __init__(self, path=THROUGHPUT_HISTORY_FILE, alpha=0.3):
+        self.path = path
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.hosts = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.hosts = json.load(f)
+            except (OSError, ValueError):
+                self.hosts = {}
+
+    def _update(self, entry, rate):
+        entry['rate'] = rate if not entry['samples'] else \
+            self.alpha * rate + (1 - self.alpha) * entry['rate']
+        entry['samples'] += 1
+
+    def record(self, url, size, seconds, engine=None):
+        """Catat satu transfer selesai; transfer sangat kecil/cepat diabaikan (didominasi latency)"""
+        if not size or seconds <= 0 or size < 1024**2:
+            return
+        host = urlparse(url).netloc.lower()
+        rate = size / seconds
+        with self.lock:
+            entry = self.hosts.setdefault(host, {'rate': rate, 'samples': 0})
+            self._update(entry, rate)
+            if engine:
+                engines = entry.setdefault('engines', {})
+                self._update(engines.setdefault(engine, {'rate': rate, 'samples': 0}), rate)
+
+    def estimate(self, url):
+        """Estimasi throughput per transfer ke host ini (bytes/s)"""
+        with self.lock:
+            entry = self.hosts.get(urlparse(url).netloc.lower())
+        return entry['rate'] if entry else SCHEDULER_DEFAULT_THROUGHPUT
+
+    def engine_rates(self, url):
+        """Throughput tercatat per engine untuk host URL ini {engine: bytes/s}"""
+        with self.lock:
+            entry = self.hosts.get(urlparse(url).netloc.lower(), {})
+            return {name: stats['rate'] for name, stats in entry.get('engines', {}).items()}
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.hosts))
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Ditulis di bawah lock: beberapa transfer bisa selesai bersamaan
+            with self.lock:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.hosts, f, indent=2)
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Gagal menyimpan riwayat throughput: {e}")
+
+_THROUGHPUT_HISTORY = None
+
+def get_throughput_history():
+    """Satu ThroughputHistory per proses"""
+    global _THROUGHPUT_HISTORY
+    if _THROUGHPUT_HISTORY is None:
+        _THROUGHPUT_HISTORY = ThroughputHistory()
+    return _THROUGHPUT_HISTORY
+
+def plan_makespan(entries, sizes, workers, history=None):
+    """
+    Urutkan entry untuk meminimalkan waktu selesai batch (makespan)
+
+    Largest-first (LPT) dengan list scheduling: worker yang bebas mengambil item
+    terlama berikutnya, selama host-nya belum memakai lebih dari separuh slot
+    (supaya satu host lambat tidak menahan semua slot). File kecil otomatis
+    mengisi celah di ekor batch.
+
+    Args:
+        entries: List entry manifest (lihat normalize_entries)
+        sizes: Dict {url: bytes atau None} dari metadata resolver
+        workers: Jumlah transfer paralel
+        history: ThroughputHistory (default: riwayat proses)
+
+    Returns:
+        tuple: (entries dalam urutan eksekusi, prediksi makespan dalam detik)
+    """
+    history = history or get_throughput_history()
+    known = sorted(size for size in sizes.values() if size)
+    # Ukuran tidak diketahui: pakai median batch sebagai tebakan
+    fallback_size = known[len(known) // 2] if known else 0
+
+    pending = []
+    for entry in entries:
+        size = sizes.get(entry['url']) or fallback_size
+        duration = size / history.estimate(entry['url'])
+        pending.append((duration, urlparse(entry['url']).netloc.lower(), entry))
+    pending.sort(key=lambda item: item[0], reverse=True)
+
+    slots = [0.0] * max(1, workers)
+    host_cap = max(1, (len(slots) + 1) // 2)
+    running = []  # (finish_time, host)
+    order = []
+    makespan = 0.0
+    while pending:
+        slot = min(range(len(slots)), key=slots.__getitem__)
+        now = slots[slot]
+        running = [(finish, host) for finish, host in running if finish > now]
+        active = {}
+        for _, host in running:
+            active[host] = active.get(host, 0) + 1
+
+        # Item terlama yang host-nya masih di bawah batas slot; jika tidak ada, item terlama
+        index = next((i for i, (_, host, _) in enumerate(pending) if active.get(host, 0) < host_cap), 0)
+        duration, host, entry = pending.pop(index)
+
+        slots[slot] = now + duration
+        running.append((slots[slot], host))
+        makespan = max(makespan, slots[slot])
+        order.append(entry)
+    return order, makespan
+
+# =============================================
+# DOWNLOAD ENGINES
+# =============================================
+
+class DownloadEngine:
+    """Interface engine download; subclass mengisi name/platforms dan download()"""
+    name = None
+    platforms = ('huggingface', 'civitai', 'other')  # Platform URL yang bisa ditangani
+    dependency = None                                # Key setup_dependencies, None = tanpa dependency
+
+    def available(self):
+        """Cek murah apakah engine bisa dipakai tanpa install (dipakai mode auto)"""
+        return True
+
+    def setup(self, downloader):
+        return downloader.setup_dependencies(self.dependency) if self.dependency else True
+
+    def download(self, downloader, url, directory, filename=None):
+        raise NotImplementedError
+
+class HfHubEngine(DownloadEngine):
+    """hf_hub_download dengan backend hf_xet atau hf_transfer"""
+    platforms = ('huggingface',)
+    dependency = 'huggingface'
+
+    def __init__(self, name, module):
+        self.name = name
+        self.module = module
+
+    def available(self):
+        return importlib.util.find_spec(self.module) is not None
+
+    def setup(self, downloader):
+        if not super().setup(downloader):
+            return False
+        if self.available():
+            return True
+        # hf_transfer tidak termasuk dependency bawaan Hugging Face
+        print(f"⏳ Installing {self.module}...")
+        try:
+            subprocess.check_call([sys.executable, "-m", "pip", "install", self.module, "-q"])
+            importlib.invalidate_caches()
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Error installing {self.module}: {e}")
+            return False
+
+    def download(self, downloader, url, directory, filename=None):
+        return downloader.download_from_huggingface(url, directory, engine=self.name, filename=filename)
+
+class HfBackendGate:
+    """
+    Backend transfer huggingface_hub (hf_xet / hf_transfer) dan progress bar tqdm-nya adalah
+    setting global proses. Backend hanya diganti saat tidak ada transfer HF berjalan; transfer
+    yang butuh backend lain menunggu sampai transfer backend aktif selesai (transfer baru ikut
+    antre di belakangnya supaya tidak kelaparan). Progress bar dimatikan selama ada transfer
+    (progress lewat renderer) dan dikembalikan setelah transfer terakhir selesai.
+    """
+
     def __init__(self):
+        self.backend = None
+        self.switch_to = None
+        self.active = 0
+        self.restore_progress_bars = False
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def use(self, backend):
+        with self.condition:
+            while (self.active and self.backend != backend) or self.switch_to not in (None, backend):
+                if self.switch_to is None:
+                    self.switch_to = backend
+                self.condition.wait()
+            if self.switch_to == backend:
+                self.switch_to = None
+            if self.backend != backend:
+                from huggingface_hub import constants
+                use_hf_transfer = backend == 'hf_transfer'
+                constants.HF_HUB_ENABLE_HF_TRANSFER = use_hf_transfer
+                constants.HF_HUB_DISABLE_XET = use_hf_transfer
+                self.backend = backend
+            if not self.active:
+                from huggingface_hub.utils import are_progress_bars_disabled, disable_progress_bars
+                self.restore_progress_bars = not are_progress_bars_disabled()
+                disable_progress_bars()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active -= 1
+                if not self.active and self.restore_progress_bars:
+                    from huggingface_hub.utils import enable_progress_bars
+                    enable_progress_bars()
+                    self.restore_progress_bars = False
+                self.condition.notify_all()
+
+HF_BACKEND_GATE = HfBackendGate()
+
+class Aria2Engine(DownloadEngine):
+    """aria2c multi-koneksi (CivitAI, URL generic, dan URL resolve Hugging Face)"""
+    name = 'aria2'
+    dependency = 'civitai'
+
+    def available(self):
+        return shutil.which('aria2c') is not None
+
+    def download(self, downloader, url, directory, filename=None):
+        return downloader.download_from_civitai(url, directory, filename)
+
+class HttpEngine(DownloadEngine):
+    """Streaming HTTP in-process lewat HTTP_CLIENT (tanpa dependency eksternal)"""
+    name = 'http'
+
+    def download(self, downloader, url, directory, filename=None):
+        return downloader.download_with_http(url, directory, filename)
+
+ENGINE_REGISTRY = {}
+
+# Engine bawaan per platform jika config tidak valid / auto belum punya riwayat
+PLATFORM_DEFAULT_ENGINES = {'huggingface': 'hf_xet', 'civitai': 'aria2', 'other': 'aria2'}
+
+def register_engine(engine):
+    """Daftarkan engine download (bisa dipakai untuk engine tambahan dari luar modul)"""
+    ENGINE_REGISTRY[engine.name] = engine
+    return engine
+
+register_engine(HfHubEngine('hf_xet', 'hf_xet'))
+register_engine(HfHubEngine('hf_transfer', 'hf_transfer'))
+register_engine(Aria2Engine())
+register_engine(HttpEngine())
+
+def select_engine(url, platform, history=None):
+    """
+    Pilih engine untuk URL: config per host > config per platform > auto
+
+    Mode auto memakai engine dengan throughput tercatat terbaik untuk host ini, dan
+    sesekali (ENGINE_EXPLORATION_RATE) mencoba engine lain supaya riwayatnya terisi.
+    """
+    host = urlparse(url).netloc.lower()
+    choice = DOWNLOAD_ENGINES.get(host) or DOWNLOAD_ENGINES.get(platform) or 'auto'
+    default = ENGINE_REGISTRY[PLATFORM_DEFAULT_ENGINES[platform]]
+
+    if choice != 'auto':
+        engine = ENGINE_REGISTRY.get(choice)
+        if engine is None or platform not in engine.platforms:
+            print(f"⚠️ Engine '{choice}' tidak dikenal / tidak mendukung {platform}, pakai {default.name}")
+            return default
+        return engine
+
+    candidates = [engine for engine in ENGINE_REGISTRY.values()
+                  if platform in engine.platforms and (engine is default or engine.available())]
+    rates = (history or get_throughput_history()).engine_rates(url)
+    tried = [engine for engine in candidates if engine.name in rates]
+    best = max(tried, key=lambda engine: rates[engine.name]) if tried else default
+
+    others = [engine for engine in candidates if engine is not best]
+    if others and random.random() < ENGINE_EXPLORATION_RATE:
+        # Eksplorasi: utamakan engine yang belum pernah dicoba di host ini
+        untried = [engine for engine in others if engine.name not in rates]
+        engine = random.choice(untried or others)
+        print(f"🧪 Auto engine: eksplorasi {engine.name} (terbaik saat ini: {best.name})")
+        return engine
+    return best
+
+def show_engines(history=None):
+    """Tampilkan engine terdaftar, config, dan riwayat throughput per host/engine"""
+    history = history or get_throughput_history()
+    print("\n⚙️  DOWNLOAD ENGINES:")
+    print("=" * 60)
+    for name, engine in ENGINE_REGISTRY.items():
+        status = '✅' if engine.available() else '➖'
+        print(f"   {status} {name:<12} {', '.join(engine.platforms)}")
+
+    print("\n🔧 Config (DOWNLOAD_ENGINES):")
+    for key, value in DOWNLOAD_ENGINES.items():
+        print(f"   {key}: {value}")
+
+    print(f"\n📈 Riwayat throughput ({history.path}):")
+    hosts = history.snapshot()
+    if not hosts:
+        print("   (belum ada)")
+    for host, entry in sorted(hosts.items()):
+        print(f"   {host}: {_format_bytes(entry['rate'])}/s ({entry['samples']} sampel)")
+        engines = sorted(entry.get('engines', {}).items(), key=lambda item: item[1]['rate'], reverse=True)
+        for name, stats in engines:
+            print(f"      └─ {name:<12} {_format_bytes(stats['rate'])}/s ({stats['samples']} sampel)")
+
+_SERVER_STAT_LOCK = threading.Lock()
+
+def read_server_stats(path):
+    """Parse file --server-stat-of aria2 jadi list dict (kosong jika file tidak ada)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    return [dict(field.split('=', 1) for field in line.split(', ') if '=' in field) for line in lines if line]
+
+def merge_server_stats(stat_file, shared_path=None):
+    """
+    Gabung statistik satu proses aria2 ke file bersama (per host + protocol, entry baru menang),
+    lalu hapus file per item. Dikunci antar thread dan antar proses (flock jika tersedia).
+    """
+    shared_path = shared_path or ARIA2_SERVER_STAT_FILE
+    stats = read_server_stats(stat_file)
+    try:
+        if stats:
+            _write_merged_server_stats(stats, shared_path)
+    except OSError as e:
+        print(f"⚠️ Statistik sumber tidak bisa disimpan: {e}")
+    try:
+        os.remove(stat_file)
+    except OSError:
+        pass
+
+def _write_merged_server_stats(stats, shared_path):
+    with _SERVER_STAT_LOCK, open(shared_path + '.lock', 'w') as lock_file:
+        try:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+        merged = {(stat.get('host'), stat.get('protocol')): stat for stat in read_server_stats(shared_path)}
+        merged.update({(stat.get('host'), stat.get('protocol')): stat for stat in stats})
+        tmp_path = shared_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for stat in merged.values():
+                f.write(', '.join(f"{key}={value}" for key, value in stat.items()) + '\n')
+        os.replace(tmp_path, shared_path)
+
+class UniversalDownloader:
+    def __init__(self, progress=None, staging_dir=None):
         self.start_time = None
+        self.progress = progress
+        self.storage = get_tiered_storage(staging_dir)
+        self.profiler = PROFILER
+        self.interactive = True
         self.system = platform.system()
         self.aria2_installed = False
         self.hf_packages_installed = False
+        self.hf_logged_in = False
+        self.active_processes = {}
+        self.cancelled_urls = set()
+        self.metadata_futures = {}
+        self.metadata_lock = threading.Lock()
+        self.resolver_pool = None
+        self.completed_paths = {}
+        self.transfer_samples = {}  # url -> (bytes ditransfer, detik) untuk riwayat engine
+        self.extra_mirrors = {}     # url -> URL mirror dari entry manifest
 
     # =============================================
     # UTILITY FUNCTIONS
@@ -37,7 +1791,8 @@ class UniversalDownloader:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"[{timestamp}] [{level}] {message}")
 
-    def format_bytes(self, bytes_size):
+    @staticmethod
+    def format_bytes(bytes_size):
         """Format bytes ke human readable format"""
         for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
             if bytes_size < 1024.0:
@@ -58,6 +1813,31 @@ class UniversalDownloader:
             mins = int((seconds % 3600) / 60)
             return f"{hours}h {mins}m"
 
+    @contextmanager
+    def progress_session(self):
+        """Pastikan ada ProgressRenderer aktif selama transfer (dibuat sendiri jika belum ada)"""
+        if self.progress is not None:
+            yield self.progress
+            return
+        self.progress = ProgressRenderer(self).start()
+        try:
+            yield self.progress
+        finally:
+            self.progress.stop()
+            self.progress = None
+
+    def prompt(self, message):
+        """input() yang aman dipakai selagi ProgressRenderer aktif"""
+        if self.progress is None:
+            return input(message)
+        with self.progress.paused():
+            return input(message)
+
+    def report_progress(self, item_id, **fields):
+        """Kirim event progress ke renderer aktif (no-op jika tidak ada)"""
+        if self.progress is not None:
+            self.progress.update(item_id, **fields)
+
     # =============================================
     # PLATFORM DETECTION
     # =============================================
@@ -303,11 +2083,17 @@ class UniversalDownloader:
 
     def setup_dependencies(self, platform):
         """Setup dependencies berdasarkan platform yang terdeteksi"""
+        # Hasil pengecekan di-cache: instance yang hidup lama tidak perlu probe ulang
         if platform == 'huggingface':
-            return self.install_packages()
+            return self.hf_packages_installed or self.install_packages()
         elif platform == 'civitai' or platform == 'other':
+            if self.aria2_installed:
+                return True
             if not self.check_aria2_installed():
-                install_choice = input("\n📥 aria2 belum terinstall. Install otomatis? (y/n): ")
+                if not self.interactive:
+                    print("❌ aria2 diperlukan untuk menjalankan download.")
+                    return False
+                install_choice = self.prompt("\n📥 aria2 belum terinstall. Install otomatis? (y/n): ")
                 if install_choice.lower() == 'y':
                     return self.install_aria2()
                 else:
@@ -322,15 +2108,25 @@ class UniversalDownloader:
     # =============================================
 
     def setup_hf_xet(self):
-        """Setup hf_xet dan login"""
+        """Setup hf_xet dan login (sekali per instance)"""
+        if self.hf_logged_in:
+            return
         print("🚀 Mengaktifkan hf_xet untuk kecepatan maksimal...")
         os.environ["HF_XET_HIGH_PERFORMANCE"] = "1"
 
+        # huggingface_hub memakai connection pool yang sama dengan resolver
+        try:
+            from huggingface_hub import configure_http_backend
+            configure_http_backend(backend_factory=lambda: HTTP_CLIENT.session_for('huggingface.co', api=True))
+        except ImportError:
+            pass
+
         try:
             from huggingface_hub import login
             print(f"🔐 Login sebagai: {HF_USERNAME}")
             login(token=HF_TOKEN, add_to_git_credential=True)
             print("✅ Login berhasil!")
+            self.hf_logged_in = True
         except Exception as e:
             print(f"⚠️  Warning login: {e}")
             print("🔄 Melanjutkan tanpa authentication...")
@@ -348,19 +2144,29 @@ class UniversalDownloader:
         else:
             raise ValueError("URL format tidak valid. Gunakan format: https://huggingface.co/USER/REPO/resolve/main/PATH")
 
-    def download_from_huggingface(self, url, local_dir):
-        """Download model dari Hugging Face dengan hf_xet"""
+    def download_from_huggingface(self, url, local_dir, engine='hf_xet', filename=None):
+        """Download model dari Hugging Face dengan hf_xet (atau hf_transfer)"""
         try:
-            from huggingface_hub import hf_hub_download
+            from huggingface_hub import hf_hub_download, try_to_load_from_cache
+
+            # Resolve metadata (ukuran/hash) di background selama setup & transfer
+            self.prefetch_metadata([url])
 
             # Setup hf_xet
-            self.setup_hf_xet()
+            with self.profiler.phase('login', url):
+                self.setup_hf_xet()
+
+            # Parse URL untuk mendapatkan repo_id dan path file di repo
+            with self.profiler.phase('parse_url', url):
+                repo_id, repo_file = self.parse_hf_url(url)
 
-            # Parse URL untuk mendapatkan repo_id dan filename
-            repo_id, filename = self.parse_hf_url(url)
+            # Nama file tujuan: filename eksplisit (CLI/manifest/katalog) atau basename di repo
+            file_name = filename or os.path.basename(repo_file)
+            final_path = os.path.join(local_dir, file_name)
 
-            # Ekstrak nama file untuk display
-            file_name = os.path.basename(filename)
+            action = self._check_existing(url, final_path, self.get_metadata(url) or {})
+            if action is not None:
+                return action
 
             # Pastikan direktori ada
             os.makedirs(local_dir, exist_ok=True)
@@ -371,39 +2177,71 @@ class UniversalDownloader:
             self.log_message(f"📁 Tujuan: {local_dir}")
 
             start_time = time.time()
+            # Cache hit tidak dihitung sebagai sampel throughput
+            cached = isinstance(try_to_load_from_cache(repo_id, repo_file), str)
 
-            # Download dengan hf_xet
-            self.log_message("🚀 Memulai download dengan hf_xet...")
+            # Download dengan hf_xet / hf_transfer
+            self.log_message(f"🚀 Memulai download dengan {engine}...")
 
-            downloaded_path = hf_hub_download(
-                repo_id=repo_id,
-                filename=filename,
-                token=HF_TOKEN,
-                resume_download=True
-            )
-
-            # Pindah file ke direktori yang diinginkan dengan nama flat
-            final_filename = os.path.basename(filename)
-            final_path = os.path.join(local_dir, final_filename)
-
-            # Pastikan direktori tujuan ada
-            os.makedirs(local_dir, exist_ok=True)
+            def attempt():
+                if url in self.cancelled_urls:
+                    return None
+                try:
+                    return hf_hub_download(
+                        repo_id=repo_id,
+                        filename=repo_file,
+                        token=HF_TOKEN,
+                        resume_download=True
+                    )
+                except Exception as e:
+                    raise self._as_retryable(e)
+
+            with self.progress_session():
+                # Progress bar tqdm bawaan HF dimatikan oleh HF_BACKEND_GATE, diganti event ke renderer
+                metadata = self.get_metadata(url) or {}
+                self.report_progress(url, name=file_name, total=metadata.get('size'), status='active')
+                # hf_hub_download tidak bisa di-pace: tunda selama ComfyUI eksekusi prompt
+                THROTTLE.wait_idle(f"download {file_name}")
+                watcher = self._watch_hf_blob(url, repo_id, metadata.get('sha256'))
+                try:
+                    with self.profiler.phase('transfer', url), HF_BACKEND_GATE.use(engine):
+                        downloaded_path = RETRY_MANAGER.call(url, attempt, f"download {file_name}")
+                except Exception:
+                    self.report_progress(url, status='failed')
+                    raise
+                finally:
+                    watcher.set()
+                if url in self.cancelled_urls:
+                    # hf_hub_download tidak bisa diinterupsi: hasilnya tidak disalin ke tujuan
+                    print("🛑 Download dibatalkan.")
+                    self.report_progress(url, status='failed')
+                    return False
+                self.report_progress(url, downloaded=os.path.getsize(downloaded_path), status='done')
 
-            # Copy file ke lokasi final
-            shutil.copy2(downloaded_path, final_path)
+            # Copy file dari cache HF ke direktori tujuan dengan nama flat
+            with self.profiler.phase('copy_from_cache', url):
+                if CACHE_FRIENDLY_WRITES:
+                    copy_file_cache_friendly(downloaded_path, final_path)
+                else:
+                    shutil.copy2(downloaded_path, final_path)
             downloaded_path = final_path
 
-            self.log_message(f"📁 File disimpan dengan struktur flat: {final_filename}")
+            self.log_message(f"📁 File disimpan dengan struktur flat: {file_name}")
 
             end_time = time.time()
             download_time = end_time - start_time
 
             # Verifikasi dan log hasil
-            if os.path.exists(downloaded_path):
+            with self.profiler.phase('verify', url):
+                verified = os.path.exists(downloaded_path) and self._verify_download(downloaded_path, self.get_metadata(url))
+            if verified:
                 file_size = os.path.getsize(downloaded_path)
                 file_size_gb = file_size / (1024**3)
                 speed_mbps = (file_size / (1024**2)) / max(download_time, 0.1)
 
+                self.completed_paths[url] = downloaded_path
+                if not cached:
+                    self.transfer_samples[url] = (file_size, download_time)
                 self.log_message("🎉 DOWNLOAD BERHASIL!", "SUCCESS")
                 self.log_message(f"📍 Lokasi: {downloaded_path}")
                 self.log_message(f"📏 Ukuran: {file_size_gb:.2f} GB")
@@ -422,107 +2260,164 @@ class UniversalDownloader:
             self.log_message(f"❌ Download Error: {str(e)}", "ERROR")
             return False
 
+    def _watch_hf_blob(self, url, repo_id, sha256=None, interval=1.0):
+        """Poll ukuran blob .incomplete di cache HF dan laporkan ke renderer"""
+        from huggingface_hub import constants
+
+        blobs_dir = os.path.join(constants.HF_HUB_CACHE, f"models--{repo_id.replace('/', '--')}", 'blobs')
+        stop_event = threading.Event()
+
+        def poll():
+            while not stop_event.wait(interval):
+                if sha256:
+                    candidates = [os.path.join(blobs_dir, f"{sha256}.incomplete")]
+                else:
+                    try:
+                        candidates = [os.path.join(blobs_dir, name) for name in os.listdir(blobs_dir)
+                                      if name.endswith('.incomplete')]
+                    except OSError:
+                        continue
+                sizes = [os.path.getsize(path) for path in candidates if os.path.exists(path)]
+                if sizes:
+                    self.report_progress(url, downloaded=max(sizes))
+
+        threading.Thread(target=poll, name='hf-progress', daemon=True).start()
+        return stop_event
+
+    def _as_retryable(self, error):
+        """Ubah exception HF/requests jadi RetryableError jika sifatnya sementara"""
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return RetryableError(f"{type(error).__name__}: {error}")
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+        if status in RETRYABLE_STATUS_CODES:
+            return RetryableError(
+                f"HTTP {status}",
+                status_code=status,
+                retry_after=parse_retry_after(response.headers.get('Retry-After'))
+            )
+        return error
+
     # =============================================
     # CIVITAI DOWNLOADER
     # =============================================
 
     def get_civitai_filename(self, url):
         """Ambil nama file dari CivitAI menggunakan API atau header response"""
-        try:
-            print("🔍 Mendeteksi nama file dari CivitAI...")
+        print("🔍 Mendeteksi nama file dari CivitAI...")
 
-            # Method 1: HEAD request untuk ambil Content-Disposition
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'application/octet-stream, */*',
-                'Referer': 'https://civitai.com/'
-            }
+        metadata = self.get_metadata(url)
+        if metadata and metadata.get('filename'):
+            print(f"✅ Nama file terdeteksi dari {metadata['source']}: {metadata['filename']}")
+            return metadata['filename']
 
-            # Pastikan URL sudah memiliki token
-            prepared_url = self.prepare_civitai_url(url)
-
-            response = requests.head(prepared_url, headers=headers, allow_redirects=True, timeout=15)
-
-            # Cek Content-Disposition header
-            if 'Content-Disposition' in response.headers:
-                content_disp = response.headers['Content-Disposition']
-                filename_match = re.search(r'filename\*?=(?:UTF-8\'\')?["\']?([^"\';\r\n]+)', content_disp)
-                if filename_match:
-                    filename = unquote(filename_match.group(1))
-                    print(f"✅ Nama file terdeteksi dari header: {filename}")
-                    return filename
-
-            # Method 2: Coba ambil dari API CivitAI jika ada model ID
-            model_id = self.extract_civitai_model_id(url)
-            if model_id:
-                api_filename = self.get_filename_from_civitai_api(model_id)
-                if api_filename:
-                    print(f"✅ Nama file terdeteksi dari API: {api_filename}")
-                    return api_filename
-
-            # Method 3: Parse dari URL
-            parsed_url = urlparse(url)
-            url_filename = unquote(os.path.basename(parsed_url.path))
-            if url_filename and '.' in url_filename:
-                print(f"✅ Nama file terdeteksi dari URL: {url_filename}")
-                return url_filename
-
-            print("⚠️ Nama file tidak terdeteksi, menggunakan fallback")
-            return None
+        # Fallback terakhir: parse dari URL
+        parsed_url = urlparse(url)
+        url_filename = unquote(os.path.basename(parsed_url.path))
+        if url_filename and '.' in url_filename:
+            print(f"✅ Nama file terdeteksi dari URL: {url_filename}")
+            return url_filename
 
-        except Exception as e:
-            print(f"⚠️ Error mendeteksi nama file: {e}")
-            return None
+        print("⚠️ Nama file tidak terdeteksi, menggunakan fallback")
+        return None
 
     def extract_civitai_model_id(self, url):
-        """Extract model ID dari URL CivitAI"""
+        """Extract model ID dari URL halaman model CivitAI"""
+        match = re.search(r'civitai\.com/models/(\d+)', url)
+        return match.group(1) if match else None
+
+    def extract_civitai_version_id(self, url):
+        """Extract model version ID dari URL download / halaman CivitAI"""
+        patterns = [
+            r'civitai\.com/api/download/models/(\d+)',
+            r'[?&]modelVersionId=(\d+)',
+        ]
+        for pattern in patterns:
+            match = re.search(pattern, url)
+            if match:
+                return match.group(1)
+        return None
+
+    def _civitai_api_get(self, path):
+        """GET ke CivitAI API v1, return JSON atau None"""
+        headers = {}
+        if CIVITAI_TOKEN:
+            headers['Authorization'] = f'Bearer {CIVITAI_TOKEN}'
         try:
-            patterns = [
-                r'civitai\.com/models/(\d+)',
-                r'civitai\.com/api/download/models/(\d+)',
-            ]
-
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    return match.group(1)
-            return None
-        except:
+            response = http_request('GET', f"https://civitai.com/api/v1/{path}", headers=headers)
+            if response.status_code == 200:
+                return response.json()
+            print(f"⚠️ CivitAI API {path} merespon HTTP {response.status_code}")
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ CivitAI API error: {e}")
+        return None
+
+    def select_civitai_file(self, files, url):
+        """Pilih file yang sesuai dengan query download URL (type/format/size/fp)"""
+        if not files:
             return None
 
-    def get_filename_from_civitai_api(self, model_id):
-        """Ambil filename dari CivitAI API"""
-        try:
-            api_url = f"https://civitai.com/api/v1/models/{model_id}"
-            headers = {}
-            if CIVITAI_TOKEN:
-                headers['Authorization'] = f'Bearer {CIVITAI_TOKEN}'
+        query = parse_qs(urlparse(url).query)
+        wanted = {key: query[key][0].lower() for key in ('type', 'format', 'size', 'fp') if key in query}
 
-            response = requests.get(api_url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if 'modelVersions' in data and data['modelVersions']:
-                    files = data['modelVersions'][0].get('files', [])
-                    if files:
-                        return files[0].get('name')
-            return None
-        except:
-            return None
+        def matches(file_info):
+            meta = file_info.get('metadata') or {}
+            values = {
+                'type': file_info.get('type'),
+                'format': meta.get('format'),
+                'size': meta.get('size'),
+                'fp': meta.get('fp'),
+            }
+            return all(str(values[key] or '').lower() == value for key, value in wanted.items())
+
+        if wanted:
+            for file_info in files:
+                if matches(file_info):
+                    return file_info
+
+        # Tanpa query: file primary adalah yang dikirim endpoint download
+        for file_info in files:
+            if file_info.get('primary'):
+                return file_info
+        return files[0]
+
+    def _civitai_file_metadata(self, file_info, source):
+        """Ubah entry file CivitAI API ke format metadata resolver"""
+        size_kb = file_info.get('sizeKB')
+        sha256 = (file_info.get('hashes') or {}).get('SHA256')
+        return {
+            'filename': file_info.get('name'),
+            'size': int(round(size_kb * 1024)) if size_kb else None,
+            'sha256': sha256.lower() if sha256 else None,
+            'source': source,
+        }
 
-    def prepare_civitai_url(self, url):
+    def get_filename_from_civitai_api(self, model_id):
+        """Ambil filename dari CivitAI API (versi terbaru dari model)"""
+        data = self._civitai_api_get(f"models/{model_id}")
+        if data and data.get('modelVersions'):
+            selected = self.select_civitai_file(data['modelVersions'][0].get('files', []), '')
+            if selected:
+                return selected.get('name')
+        return None
+
+    def prepare_civitai_url(self, url, quiet=False):
         """Prepare URL CivitAI dengan token jika diperlukan"""
-        print("🎨 URL CivitAI terdeteksi, memproses authentication...")
+        if not quiet:
+            print("🎨 URL CivitAI terdeteksi, memproses authentication...")
 
         # Jika token sudah ada di URL, gunakan apa adanya
         if 'token=' in url:
-            print("✅ Token sudah ada di URL")
+            if not quiet:
+                print("✅ Token sudah ada di URL")
             return url
 
         # Tambahkan token ke URL jika belum ada
         if CIVITAI_TOKEN:
             separator = '&' if '?' in url else '?'
             url_with_token = f"{url}{separator}token={CIVITAI_TOKEN}"
-            print("✅ Token authentication ditambahkan ke URL")
+            if not quiet:
+                print("✅ Token authentication ditambahkan ke URL")
             return url_with_token
 
         return url
@@ -532,7 +2427,8 @@ class UniversalDownloader:
         try:
             # Auto-generate filename jika tidak ada
             if filename is None:
-                detected_filename = self.get_civitai_filename(url)
+                with self.profiler.phase('resolve_filename', url):
+                    detected_filename = self.get_civitai_filename(url)
                 if detected_filename:
                     filename = detected_filename
                 else:
@@ -540,17 +2436,17 @@ class UniversalDownloader:
 
                 print(f"📝 Menggunakan filename: {filename}")
 
+            # Metadata hasil resolver (sudah di-cache jika batch melakukan prefetch)
+            with self.profiler.phase('resolve_wait', url):
+                metadata = self.get_metadata(url) or {}
+
             # Full path untuk file
             filepath = os.path.join(directory, filename)
 
             # Check existing file
-            if os.path.exists(filepath):
-                file_size = os.path.getsize(filepath)
-                print(f"⚠️  File {filename} sudah ada ({self.format_bytes(file_size)})")
-                overwrite = input("Timpa file? (y/n): ")
-                if overwrite.lower() != 'y':
-                    print("❌ Download dibatalkan.")
-                    return False
+            action = self._check_existing(url, filepath, metadata)
+            if action is not None:
+                return action
 
             print(f"\n📥 DOWNLOAD INFO:")
             print(f"🔗 URL: {url}")
@@ -562,22 +2458,26 @@ class UniversalDownloader:
             # Pastikan direktori ada
             Path(directory).mkdir(parents=True, exist_ok=True)
 
-            # Prepare URL untuk CivitAI
-            prepared_url = self.prepare_civitai_url(url)
+            # Prepare URL: token CivitAI hanya untuk CivitAI; HF di-resolve ke URL CDN bertanda tangan
+            platform = self.detect_platform(url)
+            prepared_url = self._prepare_source_url(url, platform)
 
-            # Headers untuk CivitAI
-            headers = [
-                '--header=User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                '--header=Accept: application/octet-stream, */*',
-                '--header=Referer: https://civitai.com/'
-            ]
+            # Header yang sama dengan HTTP_CLIENT (User-Agent, Accept, Referer per host)
+            headers = [f'--header={name}: {value}' for name, value in host_headers(url).items()]
+
+            # Sumber tambahan: segmen file dibagi ke semua URL sekaligus (metalink-style)
+            # Platform tiap mirror dideteksi sendiri: token hanya untuk host platform tersebut
+            sources = [prepared_url] + [self._prepare_source_url(mirror, self.detect_platform(mirror), quiet=True)
+                                        for mirror in self.mirror_urls(url)]
+            # Multi-source ditulis ke .part dulu; baru di-rename setelah ukuran/hash terverifikasi
+            download_path = filepath + '.part' if len(sources) > 1 else filepath
 
             # Konfigurasi aria2 untuk kecepatan maksimum
             cmd = [
                 'aria2c',
                 '--file-allocation=none',
                 '--max-connection-per-server=4',
-                '--split=4',
+                f'--split={4 * len(sources)}',
                 '--min-split-size=1M',
                 '--max-concurrent-downloads=1',
                 '--continue=true',
@@ -590,13 +2490,32 @@ class UniversalDownloader:
                 '--show-console-readout=true',
                 '--check-certificate=false',
                 '--timeout=60',
-                '--retry-wait=5',
-                '--max-tries=10',
+                f'--connect-timeout={HTTP_CONNECT_TIMEOUT}',
+                # Retry internal aria2 dibatasi; backoff & circuit breaker ditangani RETRY_MANAGER
+                f'--retry-wait={int(RETRY_BASE_DELAY)}',
+                '--max-tries=3',
                 '--follow-metalink=mem',
                 '--metalink-enable-unique-protocol=false',
                 '--dir=' + directory,
-                '--out=' + filename,
-            ] + headers + [prepared_url]
+                '--out=' + os.path.basename(download_path),
+            ] + headers
+
+            # Verifikasi hash oleh aria2 jika resolver memberikan sha256
+            if metadata.get('sha256'):
+                cmd.append(f"--checksum=sha-256={metadata['sha256']}")
+
+            if len(sources) > 1:
+                print(f"🪞 Multi-source: {len(sources)} sumber")
+                # Adaptive: sumber cepat dapat segmen lebih banyak, sumber lambat/gagal ditinggalkan
+                # Tiap proses aria2 menulis statistiknya sendiri, lalu digabung ke file bersama
+                os.makedirs(os.path.dirname(ARIA2_SERVER_STAT_FILE), exist_ok=True)
+                stat_file = f"{ARIA2_SERVER_STAT_FILE}.{uuid.uuid4().hex[:12]}"
+                cmd += ['--uri-selector=adaptive', f'--server-stat-of={stat_file}']
+                if os.path.exists(ARIA2_SERVER_STAT_FILE):
+                    cmd.append(f'--server-stat-if={ARIA2_SERVER_STAT_FILE}')
+
+            # Beberapa URI dalam satu perintah = mirror untuk file yang sama
+            cmd.extend(sources)
 
             # Jalankan aria2c dengan real-time output
             print(f"📁 Menyimpan ke: {filepath}")
@@ -604,37 +2523,46 @@ class UniversalDownloader:
 
             start_time = time.time()
 
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
-
-            # Parse dan display output real-time
-            for line in process.stdout:
-                line = line.strip()
-                if line:
-                    if '[' in line and ']' in line and ('DL:' in line or 'CN:' in line):
-                        sys.stdout.write('\r' + line)
-                        sys.stdout.flush()
-                    elif 'Download complete' in line:
-                        print('\n✅ ' + line)
-                    elif 'STATUS' in line and 'OK' in line:
-                        print('\n✅ Download selesai!')
-                    elif 'ERROR' in line or 'WARN' in line:
-                        print('\n⚠️  ' + line)
-                    elif line.startswith('[') and ('file(s) downloaded' in line):
-                        print('\n' + line)
-
-            process.wait()
-
-            if process.returncode == 0 and os.path.exists(filepath):
+            def attempt():
+                returncode = self._run_aria2(cmd, url)
+                if url in self.cancelled_urls:
+                    print("🛑 Download dibatalkan.")
+                    return returncode
+                if returncode in ARIA2_RETRYABLE_EXIT_CODES:
+                    raise RetryableError(f"aria2c exit code {returncode}")
+                return returncode
+
+            with self.progress_session():
+                self.report_progress(url, name=filename, total=metadata.get('size'), status='active')
+                # aria2 menulis lewat page cache: flush + drop berkala dari luar proses
+                trimmer = CacheTrimmer(download_path).start() if CACHE_FRIENDLY_WRITES else None
+                try:
+                    with self.profiler.phase('transfer', url):
+                        returncode = RETRY_MANAGER.call(url, attempt, f"download {filename}")
+                except RetryableError as e:
+                    print(f"\n❌ Retry habis: {e}")
+                    returncode = -1
+                finally:
+                    if trimmer is not None:
+                        trimmer.stop()
+                self.report_progress(url, status='done' if returncode == 0 else 'failed')
+
+            if len(sources) > 1:
+                self.print_source_stats(sources, stat_file)
+                merge_server_stats(stat_file)
+
+            with self.profiler.phase('verify', url):
+                verified = returncode == 0 and os.path.exists(download_path) and \
+                    self._verify_download(download_path, metadata)
+            if verified:
+                if download_path != filepath:
+                    os.replace(download_path, filepath)
                 end_time = time.time()
                 download_time = end_time - start_time
                 file_size = os.path.getsize(filepath)
 
+                self.completed_paths[url] = os.path.abspath(filepath)
+                self.transfer_samples[url] = (file_size, download_time)
                 print(f"\n🎉 DOWNLOAD BERHASIL!")
                 print(f"📊 Ukuran file: {self.format_bytes(file_size)}")
                 print(f"⏱️  Waktu download: {self.format_time(download_time)}")
@@ -642,11 +2570,11 @@ class UniversalDownloader:
                 print(f"📍 Lokasi file: {os.path.abspath(filepath)}")
                 return True
             else:
-                print(f"\n❌ DOWNLOAD GAGAL dengan kode: {process.returncode}")
+                print(f"\n❌ DOWNLOAD GAGAL dengan kode: {returncode}")
                 # Cleanup partial file
-                if os.path.exists(filepath):
+                if os.path.exists(download_path):
                     try:
-                        os.remove(filepath)
+                        os.remove(download_path)
                         print("🗑️  File tidak lengkap telah dihapus")
                     except:
                         pass
@@ -656,40 +2584,633 @@ class UniversalDownloader:
             print(f"\n❌ Error CivitAI download: {str(e)}")
             return False
 
-    # =============================================
-    # MAIN DOWNLOAD FUNCTION
-    # =============================================
-
-    def download_file(self, url, directory, filename=None):
-        """Main download function dengan auto-detection platform"""
-        platform = self.detect_platform(url)
-
-        print(f"\n🔍 PLATFORM DETECTION:")
-        print(f"🌐 URL: {url}")
-        print(f"📊 Platform: {platform.upper()}")
-
-        # Setup dependencies berdasarkan platform
-        if not self.setup_dependencies(platform):
-            return False
-
-        # Route ke downloader yang sesuai
+    def mirror_urls(self, url):
+        """URL mirror untuk file yang sama: dari entry manifest lalu HOST_MIRRORS"""
+        mirrors = list(self.extra_mirrors.get(url, []))
+        parsed = urlparse(url)
+        for base in HOST_MIRRORS.get(parsed.netloc.lower(), []):
+            mirror = base.rstrip('/') + parsed.path + (f'?{parsed.query}' if parsed.query else '')
+            if mirror not in mirrors:
+                mirrors.append(mirror)
+        return [mirror for mirror in mirrors if mirror != url]
+
+    def _prepare_source_url(self, url, platform, quiet=False):
+        """URL siap transfer: token CivitAI ditambahkan, URL HF di-resolve ke URL CDN bertanda tangan"""
+        host = (urlparse(url).hostname or '').lower()
+        if not any(host == suffix or host.endswith('.' + suffix) for suffix in CREDENTIAL_HOSTS.get(platform, ())):
+            # Token hanya dikirim ke host milik platformnya sendiri
+            return url
+        if platform == 'civitai':
+            return self.prepare_civitai_url(url, quiet=quiet)
         if platform == 'huggingface':
-            print("🤗 Menggunakan Hugging Face downloader (hf_xet)...")
-            return self.download_from_huggingface(url, directory)
+            return self._resolve_hf_download_url(url)
+        return url
 
-        elif platform == 'civitai':
-            print("🎨 Menggunakan CivitAI downloader (aria2)...")
-            return self.download_from_civitai(url, directory, filename)
+    def print_source_stats(self, sources, stat_file):
+        """Tampilkan kecepatan & status per sumber dari --server-stat-of aria2 item ini"""
+        stats = read_server_stats(stat_file)
+        if not stats:
+            return
+        hosts = {urlparse(source).netloc.split('@')[-1].split(':')[0].lower() for source in sources}
+        print("\n🪞 STATISTIK PER SUMBER:")
+        for stat in stats:
+            if stat.get('host', '').lower() not in hosts:
+                continue
+            speed = int(stat.get('dl_speed') or 0)
+            icon = '✅' if stat.get('status') == 'OK' else '❌'
+            print(f"   {icon} {stat['host']}: {self.format_bytes(speed)}/s ({stat.get('status', '?')})")
 
+    def _check_existing(self, url, filepath, metadata):
+        """Tangani file tujuan yang sudah ada: None = lanjut download, True/False = selesai"""
+        if not os.path.exists(filepath):
+            return None
+        file_size = os.path.getsize(filepath)
+        print(f"⚠️  File {os.path.basename(filepath)} sudah ada ({self.format_bytes(file_size)})")
+        if not self.interactive:
+            # Mode batch paralel: tidak bisa prompt, lewati jika ukurannya sudah cocok
+            if metadata.get('size') and self._verify_download(filepath, metadata):
+                print("⏭️  Ukuran cocok dengan metadata, download dilewati.")
+                self.completed_paths[url] = os.path.abspath(filepath)
+                return True
+            print("🔄 Melanjutkan/menimpa file yang ada...")
         else:
-            print("🌐 Menggunakan Generic downloader (aria2)...")
-            return self.download_from_civitai(url, directory, filename)  # Use aria2 for other URLs
+            overwrite = self.prompt("Timpa file? (y/n): ")
+            if overwrite.lower() != 'y':
+                print("❌ Download dibatalkan.")
+                return False
+        return None
+
+    def _resolve_hf_download_url(self, url):
+        """Ikuti redirect HF dengan token; URL akhir (CDN) tidak butuh Authorization"""
+        if not HF_TOKEN:
+            return url
+        try:
+            response = http_request('HEAD', url, headers={'Authorization': f'Bearer {HF_TOKEN}'},
+                                    allow_redirects=True)
+            return response.url if response.status_code < 400 else url
+        except requests.RequestException:
+            return url
+
+    def _run_aria2(self, cmd, item_id=None):
+        """Jalankan aria2c dengan output real-time, return exit code"""
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            bufsize=1
+        )
+        if item_id is not None:
+            self.active_processes[item_id] = process
+        THROTTLE.attach(process)
+
+        # Parse output real-time: readout jadi event progress, sisanya jadi log
+        for line in process.stdout:
+            line = line.strip()
+            if line:
+                if '[' in line and ']' in line and ('DL:' in line or 'CN:' in line):
+                    match = ARIA2_READOUT_PATTERN.search(line)
+                    if self.progress is not None and match:
+                        done_value, done_unit, total_value, total_unit, _, speed_value, speed_unit = match.groups()
+                        total = parse_size(total_value, total_unit)
+                        self.report_progress(
+                            item_id,
+                            downloaded=parse_size(done_value, done_unit),
+                            total=total or None,
+                            speed=parse_size(speed_value, speed_unit)
+                        )
+                    elif self.progress is None:
+                        sys.stdout.write('\r' + line)
+                        sys.stdout.flush()
+                elif 'Download complete' in line:
+                    print('\n✅ ' + line)
+                elif 'STATUS' in line and 'OK' in line:
+                    print('\n✅ Download selesai!')
+                elif 'ERROR' in line or 'WARN' in line:
+                    print('\n⚠️  ' + line)
+                elif line.startswith('[') and ('file(s) downloaded' in line):
+                    print('\n' + line)
+
+        process.wait()
+        THROTTLE.detach(process)
+        self.active_processes.pop(item_id, None)
+        return process.returncode
+
+    def cancel_transfer(self, url):
+        """
+        Batalkan transfer untuk URL. aria2 langsung dihentikan; engine http/HF dan transfer
+        yang belum mulai berhenti di pengecekan flag berikutnya. Flag dibersihkan pemanggil
+        (daemon) saat job selesai.
+
+        Returns:
+            bool: True jika proses aria2 dihentikan saat itu juga
+        """
+        self.cancelled_urls.add(url)
+        process = self.active_processes.get(url)
+        if process is not None and process.poll() is None:
+            process.terminate()
+            THROTTLE.detach(process)
+            return True
+        return False
 
     # =============================================
-    # USER INTERFACE
+    # PLAIN HTTP DOWNLOADER
     # =============================================
 
-    def get_user_input(self):
+    def download_with_http(self, url, directory, filename=None):
+        """Download streaming in-process lewat HTTP_CLIENT, resume via Range dari file .part"""
+        try:
+            platform = self.detect_platform(url)
+            metadata = self.get_metadata(url) or {}
+            if filename is None:
+                filename = self.get_civitai_filename(url) or f"download_{int(time.time())}.bin"
+                print(f"📝 Menggunakan filename: {filename}")
+
+            filepath = os.path.join(directory, filename)
+            part_path = filepath + '.part'
+            action = self._check_existing(url, filepath, metadata)
+            if action is not None:
+                return action
+
+            headers = {}
+            request_url = url
+            if platform == 'civitai':
+                request_url = self.prepare_civitai_url(url)
+            elif platform == 'huggingface' and HF_TOKEN:
+                # requests membuang Authorization saat redirect ke host CDN lain
+                headers['Authorization'] = f'Bearer {HF_TOKEN}'
+
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            print(f"📁 Menyimpan ke: {filepath}")
+            start_time = time.time()
+            transferred = 0
+
+            def attempt():
+                nonlocal transferred
+                if url in self.cancelled_urls:
+                    return False
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                request_headers = dict(headers, Range=f'bytes={offset}-') if offset else headers
+                try:
+                    response = HTTP_CLIENT.send('GET', request_url, headers=request_headers,
+                                                stream=True, allow_redirects=True)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    raise RetryableError(f"{type(e).__name__}: {e}")
+
+                with response:
+                    if response.status_code in RETRYABLE_STATUS_CODES:
+                        raise RetryableError(
+                            f"HTTP {response.status_code}",
+                            status_code=response.status_code,
+                            retry_after=parse_retry_after(response.headers.get('Retry-After'))
+                        )
+                    if response.status_code == 416 and offset:
+                        # Range di luar file: .part sudah lengkap, atau lebih besar dari file server
+                        content_range = response.headers.get('Content-Range', '')
+                        total = content_range.rsplit('/', 1)[-1] if content_range.startswith('bytes */') else ''
+                        total = int(total) if total.isdigit() else metadata.get('size')
+                        if total == offset:
+                            self.report_progress(url, downloaded=offset, total=total)
+                            return True
+                        os.remove(part_path)
+                        raise RetryableError(f"HTTP 416, .part {offset} bytes tidak cocok: mulai ulang")
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        offset = 0  # Server mengabaikan Range: mulai dari awal
+                    length = response.headers.get('Content-Length')
+                    total = offset + int(length) if length and length.isdigit() else metadata.get('size')
+                    self.report_progress(url, downloaded=offset, total=total)
+
+                    downloaded = offset
+                    window_start, window_bytes = time.time(), 0
+                    try:
+                        with open(part_path, 'ab' if offset else 'wb') as f:
+                            writer = CacheFriendlyWriter(f.fileno(), offset) if CACHE_FRIENDLY_WRITES else f
+                            for chunk in response.iter_content(HTTP_DOWNLOAD_CHUNK_SIZE):
+                                if url in self.cancelled_urls:
+                                    return False
+                                writer.write(chunk)
+                                THROTTLE.pace(len(chunk))
+                                downloaded += len(chunk)
+                                transferred += len(chunk)
+                                window_bytes += len(chunk)
+                                now = time.time()
+                                if now - window_start >= PROGRESS_REFRESH_INTERVAL:
+                                    self.report_progress(url, downloaded=downloaded,
+                                                         speed=window_bytes / (now - window_start))
+                                    window_start, window_bytes = now, 0
+                            if writer is not f:
+                                writer.close()
+                    except (requests.ConnectionError, requests.Timeout,
+                            requests.exceptions.ChunkedEncodingError) as e:
+                        raise RetryableError(f"{type(e).__name__}: {e}")
+                return True
+
+            with self.progress_session():
+                self.report_progress(url, name=filename, total=metadata.get('size'), status='active')
+                try:
+                    with self.profiler.phase('transfer', url):
+                        completed = RETRY_MANAGER.call(url, attempt, f"download {filename}")
+                except (RetryableError, requests.HTTPError) as e:
+                    print(f"\n❌ Download gagal: {e}")
+                    completed = False
+                if url in self.cancelled_urls:
+                    print("🛑 Download dibatalkan.")
+                self.report_progress(url, status='done' if completed else 'failed')
+
+            if not completed:
+                return False
+            download_time = time.time() - start_time
+            # Verifikasi .part dulu: file rusak tidak boleh sampai di path yang dibaca ComfyUI
+            with self.profiler.phase('verify', url):
+                if not self._verify_download(part_path, metadata):
+                    os.remove(part_path)
+                    return False
+            os.replace(part_path, filepath)
+
+            file_size = os.path.getsize(filepath)
+            self.completed_paths[url] = os.path.abspath(filepath)
+            self.transfer_samples[url] = (transferred, download_time)
+            print(f"\n🎉 DOWNLOAD BERHASIL!")
+            print(f"📊 Ukuran file: {self.format_bytes(file_size)}")
+            print(f"⏱️  Waktu download: {self.format_time(download_time)}")
+            print(f"🚄 Kecepatan rata-rata: {self.format_bytes(transferred/max(download_time, 0.1))}/s")
+            print(f"📍 Lokasi file: {os.path.abspath(filepath)}")
+            return True
+
+        except Exception as e:
+            print(f"\n❌ Error HTTP download: {str(e)}")
+            return False
+
+    # =============================================
+    # METADATA RESOLUTION (PIPELINED)
+    # =============================================
+
+    def resolve_metadata(self, url):
+        """Resolve filename, size dan sha256 untuk satu URL (tanpa cache)"""
+        platform = self.detect_platform(url)
+        with self.profiler.phase('resolve', url):
+            if platform == 'civitai':
+                return self.resolve_civitai_metadata(url)
+            elif platform == 'huggingface':
+                return self.resolve_hf_metadata(url)
+            return self.resolve_http_metadata(url)
+
+    def resolve_civitai_metadata(self, url):
+        """Resolve metadata CivitAI lewat API version-level, fallback ke HEAD"""
+        version_id = self.extract_civitai_version_id(url)
+        if version_id:
+            data = self._civitai_api_get(f"model-versions/{version_id}")
+            if data:
+                selected = self.select_civitai_file(data.get('files', []), url)
+                if selected:
+                    return self._civitai_file_metadata(selected, 'API')
+
+        model_id = self.extract_civitai_model_id(url)
+        if model_id:
+            data = self._civitai_api_get(f"models/{model_id}")
+            if data and data.get('modelVersions'):
+                selected = self.select_civitai_file(data['modelVersions'][0].get('files', []), url)
+                if selected:
+                    return self._civitai_file_metadata(selected, 'API')
+
+        return self.resolve_http_metadata(self.prepare_civitai_url(url))
+
+    def resolve_hf_metadata(self, url):
+        """Resolve metadata Hugging Face dari header X-Linked-* (tanpa ikut redirect)"""
+        headers = {'Authorization': f'Bearer {HF_TOKEN}'} if HF_TOKEN else {}
+        try:
+            response = http_request('HEAD', url, headers=headers, allow_redirects=False)
+        except requests.RequestException:
+            return None
+        if not 200 <= response.status_code < 400:
+            return None
+        # Content-Length pada redirect adalah panjang body redirect, bukan ukuran file
+        size = response.headers.get('X-Linked-Size')
+        if not size and response.status_code == 200:
+            size = response.headers.get('Content-Length')
+        etag = (response.headers.get('X-Linked-Etag') or '').strip('"')
+        return {
+            'filename': unquote(os.path.basename(urlparse(url).path)),
+            'size': int(size) if size and size.isdigit() else None,
+            # Etag LFS adalah sha256 isi file
+            'sha256': etag.lower() if re.fullmatch(r'[0-9a-fA-F]{64}', etag) else None,
+            'source': 'header',
+        }
+
+    def resolve_http_metadata(self, url):
+        """Resolve metadata URL generic dari HEAD (Content-Disposition/Length)"""
+        try:
+            # User-Agent/Referer default diatur per host oleh HTTP_CLIENT
+            response = http_request('HEAD', url, allow_redirects=True)
+        except requests.RequestException:
+            return None
+        if response.status_code >= 400:
+            return None
+
+        filename = None
+        content_disp = response.headers.get('Content-Disposition', '')
+        filename_match = re.search(r'filename\*?=(?:UTF-8\'\')?["\']?([^"\';\r\n]+)', content_disp)
+        if filename_match:
+            filename = unquote(filename_match.group(1))
+        size = response.headers.get('Content-Length')
+        return {
+            'filename': filename,
+            'size': int(size) if size and size.isdigit() else None,
+            'sha256': None,
+            'source': 'header',
+        }
+
+    def prefetch_metadata(self, urls, max_workers=RESOLVER_WORKERS):
+        """Mulai resolve metadata semua URL secara paralel, mendahului antrean transfer"""
+        with self.metadata_lock:
+            if self.resolver_pool is None:
+                self.resolver_pool = ThreadPoolExecutor(max_workers=max_workers,
+                                                        thread_name_prefix='resolver')
+            for url in urls:
+                if url not in self.metadata_futures:
+                    self.metadata_futures[url] = self.resolver_pool.submit(self.resolve_metadata, url)
+
+    def get_metadata(self, url):
+        """Ambil metadata hasil prefetch (tunggu jika belum selesai) atau resolve langsung"""
+        with self.metadata_lock:
+            future = self.metadata_futures.get(url)
+        if future is None:
+            self.prefetch_metadata([url])
+            with self.metadata_lock:
+                future = self.metadata_futures[url]
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"⚠️ Gagal resolve metadata: {e}")
+            return None
+
+    def forget(self, url):
+        """Buang state per-URL (metadata, path) supaya batch sangat besar tetap hemat memori"""
+        with self.metadata_lock:
+            self.metadata_futures.pop(url, None)
+        self.completed_paths.pop(url, None)
+        self.transfer_samples.pop(url, None)
+        self.extra_mirrors.pop(url, None)
+        self.cancelled_urls.discard(url)
+
+    def _verify_download(self, filepath, metadata):
+        """Cek ukuran file hasil download terhadap metadata resolver"""
+        expected = (metadata or {}).get('size')
+        if not expected:
+            return True
+        actual = os.path.getsize(filepath)
+        # sizeKB CivitAI dibulatkan, beri toleransi 1 KB
+        if abs(actual - expected) > 1024:
+            print(f"❌ Ukuran tidak cocok: {self.format_bytes(actual)} vs ekspektasi {self.format_bytes(expected)}")
+            return False
+        return True
+
+    def preflight(self, url):
+        """
+        Cek satu URL sebelum transfer: auth, reachability, redirect akhir, ukuran,
+        filename dan dukungan Range. Hanya 1 byte yang diminta (Range: bytes=0-0).
+
+        Returns:
+            dict: {'url', 'platform', 'ok', 'status', 'error', 'final_url', 'size', 'filename', 'range'}
+        """
+        platform = self.detect_platform(url)
+        result = {'url': url, 'platform': platform, 'ok': False, 'status': None, 'error': None,
+                  'final_url': None, 'size': None, 'filename': None, 'range': False}
+
+        headers = {'Range': 'bytes=0-0'}
+        request_url = url
+        if platform == 'huggingface':
+            try:
+                self.parse_hf_url(url)
+            except ValueError as e:
+                result['error'] = str(e)
+                return result
+            if HF_TOKEN:
+                headers['Authorization'] = f'Bearer {HF_TOKEN}'
+        elif platform == 'civitai':
+            request_url = self.prepare_civitai_url(url, quiet=True)
+
+        try:
+            # Lewat RETRY_MANAGER: burst preflight ikut backoff & circuit breaker per host
+            response = HTTP_CLIENT.request('GET', request_url, headers=headers, allow_redirects=True, stream=True)
+        except requests.RequestException as e:
+            result['error'] = f"Tidak bisa dijangkau: {type(e).__name__}"
+            return result
+
+        with response:
+            status = response.status_code
+            result['status'] = status
+            # Jangan bocorkan token CivitAI ke report
+            result['final_url'] = re.sub(r'([?&]token=)[^&]+', r'\1***', response.url)
+
+            if status in (401, 403):
+                result['error'] = f"HTTP {status}: token tidak valid / akses ditolak (gated?)"
+                return result
+            if status >= 400 and status not in RETRYABLE_STATUS_CODES:
+                result['error'] = f"HTTP {status}"
+                return result
+            if status in RETRYABLE_STATUS_CODES:
+                # Masih gagal setelah retry, tapi sifatnya sementara: jangan buang item
+                result['ok'] = True
+                result['error'] = f"HTTP {status} (sementara, akan di-retry saat transfer)"
+                return result
+
+            content_type = response.headers.get('Content-Type', '')
+            if content_type.startswith('text/html'):
+                # Link kadaluarsa / halaman login, bukan file model
+                result['error'] = "Server mengembalikan halaman HTML, bukan file"
+                return result
+
+            content_range = response.headers.get('Content-Range', '')
+            range_match = re.search(r'/(\d+)$', content_range)
+            if status == 206:
+                result['range'] = True
+                if range_match:
+                    result['size'] = int(range_match.group(1))
+            else:
+                result['range'] = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+                length = response.headers.get('Content-Length')
+                result['size'] = int(length) if length and length.isdigit() else None
+
+            content_disp = response.headers.get('Content-Disposition', '')
+            filename_match = re.search(r'filename\*?=(?:UTF-8\'\')?["\']?([^"\';\r\n]+)', content_disp)
+            if filename_match:
+                result['filename'] = unquote(filename_match.group(1))
+            else:
+                result['filename'] = unquote(os.path.basename(urlparse(response.url).path)) or None
+
+        result['ok'] = True
+        return result
+
+    # =============================================
+    # MAIN DOWNLOAD FUNCTION
+    # =============================================
+
+    def download_file(self, url, directory, filename=None):
+        """Main download function dengan auto-detection platform"""
+        with self.profiler.phase('download_file', url):
+            cached_before = page_cache_footprint() if CACHE_FRIENDLY_WRITES else None
+            success = self._download_file(url, directory, filename)
+            if cached_before is not None:
+                self.print_cache_footprint(url, cached_before)
+            return success
+
+    def print_cache_footprint(self, url, cached_before):
+        """Bandingkan page cache sistem sebelum/sesudah download + residency file hasil"""
+        cached_after = page_cache_footprint()
+        if cached_after is None:
+            return
+        delta = cached_after - cached_before
+        line = (f"🧊 Page cache: {self.format_bytes(cached_before)} → {self.format_bytes(cached_after)} "
+                f"({'+' if delta >= 0 else '-'}{self.format_bytes(abs(delta))})")
+        filepath = self.completed_paths.get(url)
+        resident = page_cache_resident_bytes(filepath) if filepath and os.path.exists(filepath) else None
+        if resident is not None:
+            line += f" • file resident {self.format_bytes(resident)}/{self.format_bytes(os.path.getsize(filepath))}"
+        print(line)
+
+    def _download_file(self, url, directory, filename=None):
+        platform = self.detect_platform(url)
+        if url in self.cancelled_urls:
+            print("🛑 Download dibatalkan sebelum dimulai.")
+            return False
+
+        print(f"\n🔍 PLATFORM DETECTION:")
+        print(f"🌐 URL: {url}")
+        print(f"📊 Platform: {platform.upper()}")
+
+        # Tiered storage: tulis ke scratch lokal dulu jika muat
+        target_directory = directory
+        if self.storage is not None:
+            metadata = self.get_metadata(url) or {}
+            name = filename or metadata.get('filename')
+            if name and os.path.lexists(os.path.join(target_directory, name)):
+                # File sudah ada di volume: cek/prompt oleh engine terhadap path asli, bukan staging
+                print("⚠️  File sudah ada di volume, staging dilewati")
+            elif self.storage.has_space(metadata.get('size')):
+                directory = self.storage.staging_directory_for(directory)
+                print(f"⚡ Staging ke scratch lokal: {directory}")
+
+        # File yang sama sudah ada di volume lokal lain: salin, tanpa network
+        engine = None
+        with self.profiler.phase('local_source', url):
+            success = self._copy_from_local_source(url, directory, filename)
+
+        if success is None:
+            # Pilih engine (config per host/platform atau auto dari riwayat throughput)
+            engine = select_engine(url, platform)
+
+            # Setup dependencies engine
+            with self.profiler.phase('dependency_check', url):
+                if not engine.setup(self):
+                    return False
+
+            # Route ke engine terpilih
+            print(f"⚙️  Menggunakan engine: {engine.name}")
+            success = engine.download(self, url, directory, filename)
+
+        sample = self.transfer_samples.pop(url, None)
+        if success and sample and engine is not None:
+            # Copy dari sumber lokal tidak masuk riwayat throughput engine
+            history = get_throughput_history()
+            history.record(url, *sample, engine=engine.name)
+            history.save()
+
+        if success and VALIDATE_AFTER_DOWNLOAD:
+            with self.profiler.phase('validate', url):
+                success = self.validate_download(url)
+
+        if success and directory != target_directory and url in self.completed_paths:
+            staged_path = self.completed_paths[url]
+            final_path = os.path.join(target_directory, os.path.basename(staged_path))
+            with self.profiler.phase('stage_register', url):
+                self.storage.register(staged_path, final_path)
+            self.completed_paths[url] = final_path
+        return success
+
+    def _copy_from_local_source(self, url, directory, filename=None):
+        """
+        Penuhi URL dari LOCAL_SOURCES jika file dengan nama & ukuran sama tersedia
+        (dan sha256 sama jika resolver memberikannya)
+
+        Returns:
+            None jika harus download dari network, selain itu hasil akhir (True/False)
+        """
+        index = get_local_source_index()
+        if index is None:
+            return None
+        metadata = self.get_metadata(url) or {}
+        filename = filename or metadata.get('filename')
+        source = index.find(filename, metadata.get('size'))
+        if source is None:
+            return None
+
+        destination = os.path.join(directory, filename)
+        if os.path.abspath(source) == os.path.abspath(destination):
+            self.completed_paths[url] = os.path.abspath(destination)
+            return True
+
+        action = self._check_existing(url, destination, metadata)
+        if action is not None:
+            return action
+
+        print(f"📀 Ditemukan di sumber lokal: {source}")
+        if metadata.get('sha256'):
+            with self.profiler.phase('local_source_hash', url):
+                digest = _sha256_file(source)
+            if digest != metadata['sha256'].lower():
+                print("⚠️ sha256 sumber lokal tidak cocok, lanjut download dari network")
+                return None
+        try:
+            method, _ = clone_file(source, destination)
+        except OSError as e:
+            print(f"⚠️ Gagal menyalin dari sumber lokal ({e}), lanjut download dari network")
+            return None
+        print(f"✅ Disalin ke {destination} ({method})")
+        self.completed_paths[url] = os.path.abspath(destination)
+        return True
+
+    def validate_download(self, url):
+        """Cek format file hasil download dan validasi struktur .safetensors"""
+        filepath = self.completed_paths.get(url)
+        if not filepath or not os.path.exists(filepath):
+            return True
+
+        file_format = detect_model_format(filepath)
+        if filepath.lower().endswith(('.safetensors', '.sft')) and file_format != 'safetensors':
+            extensions = {'zip': '.ckpt', 'pickle': '.ckpt', 'gguf': '.gguf'}
+            if file_format not in extensions:
+                print(f"❌ File bukan safetensors maupun format model yang dikenal: {filepath}")
+                return self._quarantine(url, filepath)
+            # Nama fallback .safetensors tidak sesuai isi file: perbaiki ekstensinya
+            fixed_path = os.path.splitext(filepath)[0] + extensions[file_format]
+            os.replace(filepath, fixed_path)
+            self.completed_paths[url] = fixed_path
+            print(f"🔧 Format file {file_format}, diganti nama: {os.path.basename(fixed_path)}")
+            return True
+
+        if file_format == 'safetensors':
+            ok, message = validate_safetensors(filepath)
+            if not ok:
+                print(f"❌ Validasi safetensors gagal: {message}")
+                return self._quarantine(url, filepath)
+            print(f"✅ Validasi safetensors: {message}")
+        return True
+
+    def _quarantine(self, url, filepath):
+        """Pindahkan file gagal validasi ke .invalid supaya tidak dianggap lengkap oleh run berikutnya"""
+        invalid_path = filepath + '.invalid'
+        os.replace(filepath, invalid_path)
+        self.completed_paths.pop(url, None)
+        print(f"🗑️  File dipindah ke {os.path.basename(invalid_path)}")
+        return False
+
+    # =============================================
+    # USER INTERFACE
+    # =============================================
+
+    def get_user_input(self):
         """Ambil input URL dan direktori dari user"""
         print("\n" + "="*70)
         print("📥 UNIVERSAL AI MODEL DOWNLOADER")
@@ -788,110 +3309,409 @@ def quick_download(url, directory="./downloads", filename=None):
     downloader = UniversalDownloader()
     return downloader.download_file(url, directory, filename)
 
-def batch_download_individual(url_directory_map):
+class BatchStats:
+    """Agregat berjalan untuk hasil batch (memori konstan, satu pass)"""
+
+    def __init__(self):
+        self.success = 0
+        self.failed = 0
+        self.total_time = 0.0
+        self.platform_stats = {}
+        self.directory_stats = {}
+
+    @property
+    def total(self):
+        return self.success + self.failed
+
+    def add(self, result):
+        key = 'success' if result['success'] else 'failed'
+        setattr(self, key, getattr(self, key) + 1)
+        self.total_time += result['time']
+        for stats, name in ((self.platform_stats, result['platform']), (self.directory_stats, result['directory'])):
+            stats.setdefault(name, {'success': 0, 'failed': 0})[key] += 1
+
+    def print_summary(self):
+        print(f"\n📊 BATCH SELESAI:")
+        print(f"✅ Berhasil: {self.success}")
+        print(f"❌ Gagal: {self.failed}")
+        print(f"📁 Total: {self.total}")
+
+        print("\n📈 BREAKDOWN BY PLATFORM:")
+        for platform, stats in self.platform_stats.items():
+            total_platform = stats['success'] + stats['failed']
+            success_rate = (stats['success'] / total_platform * 100) if total_platform > 0 else 0
+            print(f"   {platform.upper()}: {stats['success']}/{total_platform} ({success_rate:.1f}%)")
+
+        if len(self.directory_stats) > 1:  # Hanya tampilkan jika ada multiple directories
+            print("\n📁 BREAKDOWN BY DIRECTORY:")
+            for directory, stats in self.directory_stats.items():
+                total_dir = stats['success'] + stats['failed']
+                success_rate = (stats['success'] / total_dir * 100) if total_dir > 0 else 0
+                short_dir = directory.split('/')[-1] if '/' in directory else directory
+                print(f"   {short_dir}: {stats['success']}/{total_dir} ({success_rate:.1f}%)")
+
+def _start_batch(staging_dir, max_parallel):
+    """Siapkan downloader bersama + renderer untuk satu batch"""
+    downloader = UniversalDownloader(staging_dir=staging_dir)
+    # Satu renderer untuk semua transfer dalam batch
+    downloader.progress = ProgressRenderer(downloader).start()
+    # Prompt interaktif tidak aman saat beberapa transfer berjalan bersamaan
+    downloader.interactive = max_parallel <= 1
+    return downloader
+
+def _run_batch_item(downloader, label, entry):
+    """Download satu entry batch dan return dict hasil"""
+    url, directory = entry['url'], entry['directory']
+    platform = downloader.detect_platform(url)
+    print(f"\n[{label}] {platform.upper()}: {entry.get('filename') or 'auto-filename'}")
+    print(f"📁 Target: {directory}")
+
+    if entry.get('mirrors'):
+        downloader.extra_mirrors[url] = entry['mirrors']
+    start_time = time.time()
+    success = downloader.download_file(url, directory, entry.get('filename'))  # None = auto-detect
+    end_time = time.time()
+
+    filepath = downloader.completed_paths.get(url)
+    print("-" * 60)
+    return {
+        'url': url,
+        'directory': directory,
+        'platform': platform,
+        'success': success,
+        'time': end_time - start_time,
+        'filepath': filepath,
+        'hot': bool(entry.get('hot'))
+    }
+
+def _finish_batch(downloader, stats, backoff_start):
+    """Hentikan renderer lalu tampilkan ringkasan; return waktu backoff batch"""
+    downloader.progress.stop()
+    downloader.progress = None
+    stats.print_summary()
+
+    if downloader.storage is not None and downloader.storage.pending:
+        print(f"\n🗂️  {len(downloader.storage.pending)} file masih dimigrasi ke volume di background")
+
+    # Waktu yang habis untuk backoff (rate limit / circuit breaker)
+    RETRY_MANAGER.print_stats()
+    HTTP_CLIENT.print_stats()
+    return RETRY_MANAGER.total_backoff_time() - backoff_start
+
+def batch_download_individual(url_directory_map, max_parallel=1, staging_dir=None,
+                              preflight=False, preflight_report=None, scheduler=None):
     """
     Download multiple files dengan direktori individual untuk setiap file
 
     Args:
-        url_directory_map: Dict {url: directory}
+        url_directory_map: Dict {url: directory} atau list entry manifest
+            [{'url': ..., 'directory': ..., 'filename': opsional, 'hot': opsional}]
+        max_parallel: Jumlah transfer yang berjalan bersamaan (default: 1)
+        staging_dir: Scratch lokal untuk tiered storage (default: STAGING_DIR)
+        preflight: Jika True, cek semua URL dulu dan buang item yang gagal
+        preflight_report: Path report JSON hasil preflight (opsional)
+        scheduler: "fifo" (urutan input) atau "makespan" (default: BATCH_SCHEDULER)
 
     Returns:
-        dict: {'success': count, 'failed': count, 'total': count, 'results': []}
+        dict: {'success': count, 'failed': count, 'total': count, 'results': [], 'backoff_time': detik}
+              ditambah 'preflight' (list hasil cek) jika preflight dijalankan dan
+              'makespan' {'predicted', 'actual'} jika scheduler makespan dipakai
     """
-    downloader = UniversalDownloader()
+    entries = dedupe_entries(normalize_entries(url_directory_map))
+    checks = None
+    if preflight:
+        checks = preflight_batch(entries, report_path=preflight_report)
+        entries = [entry for entry, check in zip(entries, checks) if check['ok']]
+    total = len(entries)
+    backoff_start = RETRY_MANAGER.total_backoff_time()
+    downloader = _start_batch(staging_dir, max_parallel)
+    stats = BatchStats()
+
+    print(f"📦 BATCH DOWNLOAD: {total} file(s)" + (f" • {max_parallel} paralel" if max_parallel > 1 else ""))
+    print("=" * 60)
 
-    total = len(url_directory_map)
-    success_count = 0
-    failed_count = 0
+    # Resolve metadata semua item secara paralel selagi transfer berjalan
+    downloader.prefetch_metadata([entry['url'] for entry in entries])
+
+    predicted = None
+    if (scheduler or BATCH_SCHEDULER) == 'makespan':
+        if checks is not None:
+            sizes = {check['url']: check['size'] for check in checks}
+        else:
+            sizes = {entry['url']: (downloader.get_metadata(entry['url']) or {}).get('size') for entry in entries}
+        entries, predicted = plan_makespan(entries, sizes, max_parallel)
+        print(f"🗓️  Scheduler makespan: largest-first, prediksi selesai {downloader.format_time(predicted)}")
+
+    items = [(f"{i}/{total}", entry) for i, entry in enumerate(entries, 1)]
     results = []
+    transfer_start = time.time()
+    try:
+        if max_parallel > 1:
+            # State downloader per URL: URL yang sama ke tujuan lain dijalankan di gelombang berikutnya
+            waves = url_waves(items)
+            with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix='transfer') as pool:
+                for index, wave in enumerate(waves):
+                    results.extend(pool.map(lambda item: _run_batch_item(downloader, *item), wave))
+                    later_urls = {entry['url'] for later in waves[index + 1:] for _, entry in later}
+                    for _, entry in wave:
+                        if entry['url'] in later_urls:
+                            downloader.forget(entry['url'])
+        else:
+            results = [_run_batch_item(downloader, label, entry) for label, entry in items]
+    finally:
+        for result in results:
+            stats.add(result)
+        backoff_time = _finish_batch(downloader, stats, backoff_start)
+    actual = time.time() - transfer_start
+
+    summary = {
+        'success': stats.success,
+        'failed': stats.failed,
+        'total': total,
+        'results': results,
+        'backoff_time': backoff_time
+    }
+    if checks is not None:
+        summary['preflight'] = checks
+    if predicted is not None:
+        print(f"🗓️  Makespan: prediksi {downloader.format_time(predicted)} • aktual {downloader.format_time(actual)}")
+        summary['makespan'] = {'predicted': predicted, 'actual': actual}
+    return summary
+
+def preflight_batch(entries, max_workers=PREFLIGHT_WORKERS, report_path=None, downloader=None):
+    """
+    Preflight semua entry batch secara paralel sebelum bandwidth dipakai
 
-    print(f"📦 BATCH DOWNLOAD: {total} file(s)")
-    print("=" * 60)
+    Args:
+        entries: List entry manifest (lihat normalize_entries) atau dict {url: directory}
+        max_workers: Jumlah cek paralel (maksimal HTTP_POOL_SIZE)
+        report_path: Jika diisi, hasil ditulis sebagai JSON ke path ini
+        downloader: UniversalDownloader yang dipakai ulang (opsional)
 
-    for i, (url, directory) in enumerate(url_directory_map.items(), 1):
-        platform = downloader.detect_platform(url)
-        print(f"\n[{i}/{total}] {platform.upper()}: auto-filename")
-        print(f"📁 Target: {directory}")
+    Returns:
+        list: Hasil UniversalDownloader.preflight per entry (urutan sama), plus 'directory'
+    """
+    entries = normalize_entries(entries)
+    downloader = downloader or UniversalDownloader()
+    # Lebih banyak worker dari pool koneksi hanya menambah koneksi baru ke host yang sama
+    max_workers = min(max_workers, HTTP_POOL_SIZE)
+    start_time = time.time()
+    print(f"\n🛫 PREFLIGHT: cek {len(entries)} URL ({min(max_workers, len(entries) or 1)} paralel)...")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preflight') as pool:
+        checks = list(pool.map(lambda entry: downloader.preflight(entry['url']), entries))
+    for entry, check in zip(entries, checks):
+        check['directory'] = entry['directory']
+
+    print_preflight(checks, downloader)
+    print(f"⏱️  Preflight selesai dalam {time.time() - start_time:.1f}s")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'checked_at': datetime.now().isoformat(timespec='seconds'), 'results': checks}, f, indent=2)
+        print(f"📝 Report preflight: {report_path}")
+    return checks
+
+def print_preflight(checks, downloader):
+    """Tampilkan tabel hasil preflight"""
+    for i, check in enumerate(checks, 1):
+        icon = ('⚠️ ' if check['error'] else '✅') if check['ok'] else '❌'
+        size = downloader.format_bytes(check['size']) if check['size'] else '?'
+        detail = check['error'] if check['error'] else f"{size} • Range {'ya' if check['range'] else 'tidak'}"
+        print(f"   {i}. {icon} {check['platform'].upper()}: {check['filename'] or check['url'][:50]} | {detail}")
+
+    failed = [check for check in checks if not check['ok']]
+    total_size = sum(check['size'] or 0 for check in checks if check['ok'])
+    print(f"📊 Lolos: {len(checks) - len(failed)}/{len(checks)} • Total ukuran: {downloader.format_bytes(total_size)}")
+    if failed:
+        print(f"🚫 {len(failed)} item gagal preflight dan tidak akan didownload")
+
+def iter_manifest(path):
+    """Baca manifest secara lazy: JSONL per baris; JSON biasa tetap dimuat utuh"""
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield normalize_entries([json.loads(line)])[0]
+    else:
+        yield from load_manifest(path)
 
-        start_time = time.time()
-        success = downloader.download_file(url, directory, None)  # filename = None for auto-detect
-        end_time = time.time()
-
-        result = {
-            'url': url,
-            'directory': directory,
-            'platform': platform,
-            'success': success,
-            'time': end_time - start_time
-        }
-        results.append(result)
+def batch_download_stream(items, report_path, max_parallel=4, window=None, staging_dir=None):
+    """
+    Batch download dengan memori konstan untuk manifest sangat besar
 
-        if success:
-            success_count += 1
-        else:
-            failed_count += 1
+    Item dibaca lazy dari iterator/manifest, hanya `window` item yang aktif sekaligus
+    (resolve metadata + transfer), dan setiap hasil langsung ditulis ke report JSONL.
+    State downloader per URL, jadi URL duplikat dijalankan berurutan, bukan bersamaan.
 
-        print("-" * 60)
+    Args:
+        items: Iterable entry manifest atau path file manifest (.jsonl dibaca per baris)
+        report_path: Path output report JSONL (satu hasil per baris)
+        max_parallel: Jumlah transfer bersamaan
+        window: Jumlah item in-flight maksimal (default: 2 x max_parallel, resolver jalan di depan)
+        staging_dir: Scratch lokal untuk tiered storage (default: STAGING_DIR)
 
-    final_result = {
-        'success': success_count,
-        'failed': failed_count,
-        'total': total,
-        'results': results
-    }
+    Returns:
+        dict: {'success': count, 'failed': count, 'total': count, 'report': path, 'backoff_time': detik}
+    """
+    if isinstance(items, str):
+        items = iter_manifest(items)
+    window = window or max_parallel * 2
+    backoff_start = RETRY_MANAGER.total_backoff_time()
+    downloader = _start_batch(staging_dir, max_parallel)
+    stats = BatchStats()
+
+    print(f"📦 STREAMING BATCH • {max_parallel} paralel • window {window}")
+    print(f"📝 Report: {report_path}")
+    print("=" * 60)
 
-    print(f"\n📊 BATCH SELESAI:")
-    print(f"✅ Berhasil: {success_count}")
-    print(f"❌ Gagal: {failed_count}")
-    print(f"📁 Total: {total}")
+    in_flight = {}
+    deferred = []  # (nomor, entry) dengan URL yang sedang in-flight, menunggu giliran
+    iterator = iter(enumerate(items, 1))
+    exhausted = False
+    try:
+        with open(report_path, 'w', encoding='utf-8') as report, \
+                ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix='transfer') as pool:
 
-    # Breakdown by platform
-    platform_stats = {}
-    for result in results:
-        platform = result['platform']
-        if platform not in platform_stats:
-            platform_stats[platform] = {'success': 0, 'failed': 0}
+            def submit(i, entry):
+                # Metadata item baru langsung di-resolve di depan transfer
+                downloader.prefetch_metadata([entry['url']])
+                in_flight[pool.submit(_run_batch_item, downloader, str(i), entry)] = entry['url']
 
-        if result['success']:
-            platform_stats[platform]['success'] += 1
-        else:
-            platform_stats[platform]['failed'] += 1
-
-    print("\n📈 BREAKDOWN BY PLATFORM:")
-    for platform, stats in platform_stats.items():
-        total_platform = stats['success'] + stats['failed']
-        success_rate = (stats['success'] / total_platform * 100) if total_platform > 0 else 0
-        print(f"   {platform.upper()}: {stats['success']}/{total_platform} ({success_rate:.1f}%)")
-
-    # Breakdown by directory (untuk individual mode)
-    directory_stats = {}
-    for result in results:
-        directory = result['directory']
-        if directory not in directory_stats:
-            directory_stats[directory] = {'success': 0, 'failed': 0}
-
-        if result['success']:
-            directory_stats[directory]['success'] += 1
-        else:
-            directory_stats[directory]['failed'] += 1
+            while in_flight or not exhausted:
+                # Isi window; item yang ditunda tetap dihitung supaya memori tetap terbatas
+                while not exhausted and len(in_flight) + len(deferred) < window:
+                    try:
+                        i, entry = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if entry['url'] in in_flight.values():
+                        deferred.append((i, entry))
+                    else:
+                        submit(i, entry)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    result = future.result()
+                    stats.add(result)
+                    report.write(json.dumps(result) + '\n')
+                    downloader.forget(url)
+                    # Duplikat berikutnya untuk URL ini baru jalan setelah state-nya dibersihkan
+                    for index, (i, entry) in enumerate(deferred):
+                        if entry['url'] == url:
+                            submit(*deferred.pop(index))
+                            break
+                report.flush()
+    finally:
+        backoff_time = _finish_batch(downloader, stats, backoff_start)
+
+    return {
+        'success': stats.success,
+        'failed': stats.failed,
+        'total': stats.total,
+        'report': report_path,
+        'backoff_time': backoff_time
+    }
+
+def normalize_entries(items):
+    """Ubah dict {url: directory} atau list entry jadi list entry manifest"""
+    if isinstance(items, dict):
+        return [{'url': url, 'directory': directory} for url, directory in items.items()]
+    entries = []
+    for entry in items:
+        if 'url' not in entry or 'directory' not in entry:
+            raise ValueError(f"Entry manifest wajib punya 'url' dan 'directory': {entry}")
+        entries.append(dict(entry))
+    return entries
+
+def dedupe_entries(entries):
+    """Buang entry dengan URL + tujuan (directory, filename) yang sama dengan entry sebelumnya"""
+    unique, seen = [], set()
+    for entry in entries:
+        key = (entry['url'], os.path.abspath(entry['directory']), entry.get('filename'))
+        if key in seen:
+            print(f"⏭️  Entry duplikat dilewati: {entry['url']} -> {entry['directory']}")
+            continue
+        seen.add(key)
+        unique.append(entry)
+    return unique
+
+def url_waves(items):
+    """Bagi item (label, entry) jadi gelombang berurutan; tiap URL muncul maksimal sekali per gelombang"""
+    waves = []
+    for item in items:
+        url = item[1]['url']
+        wave = next((wave for wave in waves if all(entry['url'] != url for _, entry in wave)), None)
+        if wave is None:
+            wave = []
+            waves.append(wave)
+        wave.append(item)
+    return waves
+
+def load_manifest(path):
+    """
+    Load manifest batch dari file JSON atau JSONL
 
-    if len(directory_stats) > 1:  # Hanya tampilkan jika ada multiple directories
-        print("\n📁 BREAKDOWN BY DIRECTORY:")
-        for directory, stats in directory_stats.items():
-            total_dir = stats['success'] + stats['failed']
-            success_rate = (stats['success'] / total_dir * 100) if total_dir > 0 else 0
-            short_dir = directory.split('/')[-1] if '/' in directory else directory
-            print(f"   {short_dir}: {stats['success']}/{total_dir} ({success_rate:.1f}%)")
+    Format yang didukung:
+        JSON dict   : {"url": "directory", ...}
+        JSON list   : [{"url": ..., "directory": ..., "filename": ..., "hot": true,
+                        "mirrors": [url lain untuk file yang sama]}, ...]
+        JSONL       : satu entry per baris (format sama dengan JSON list)
+    """
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in content.splitlines() if line.strip()]
+    return normalize_entries(data)
+
+def manifest_entry_path(downloader, entry):
+    """Tentukan path file lokal untuk entry manifest (filename eksplisit atau hasil resolver)"""
+    filename = entry.get('filename')
+    if not filename and downloader.detect_platform(entry['url']) == 'huggingface':
+        filename = os.path.basename(urlparse(entry['url']).path)
+    if not filename:
+        filename = (downloader.get_metadata(entry['url']) or {}).get('filename')
+    return os.path.join(entry['directory'], unquote(filename)) if filename else None
+
+def batch_download_manifest(manifest_path, max_parallel=1, warmup=False, staging_dir=None,
+                            preflight=False, preflight_report=None, scheduler=None):
+    """
+    Download semua entry di manifest, lalu (opsional) warmup page cache file "hot"
 
-    return final_result
+    Args:
+        manifest_path: Path file manifest JSON/JSONL
+        max_parallel: Jumlah transfer yang berjalan bersamaan
+        warmup: Jika True, file dengan "hot": true di-readahead ke page cache setelah download
+        staging_dir: Scratch lokal untuk tiered storage (default: STAGING_DIR)
+        preflight: Jika True, cek semua URL dulu dan buang item yang gagal
+        preflight_report: Path report JSON hasil preflight (opsional)
+        scheduler: "fifo" atau "makespan" (default: BATCH_SCHEDULER)
 
-def batch_download(urls, directory="./downloads"):
+    Returns:
+        dict: hasil batch_download_individual, ditambah 'warmup' jika warmup dijalankan
+    """
+    result = batch_download_individual(load_manifest(manifest_path), max_parallel, staging_dir,
+                                       preflight, preflight_report, scheduler)
+    if warmup:
+        hot_paths = [r['filepath'] for r in result['results'] if r['hot'] and r['success'] and r['filepath']]
+        if hot_paths:
+            result['warmup'] = warmup_files(hot_paths)
+    return result
+
+def batch_download(urls, directory="./downloads", max_parallel=1):
     """
     Download multiple files sekaligus ke direktori yang sama (backward compatibility)
 
     Args:
         urls: List URLs atau dict {url: filename}
         directory: Direktori tujuan
+        max_parallel: Jumlah transfer yang berjalan bersamaan
 
     Returns:
         dict: {'success': count, 'failed': count, 'total': count, 'results': []}
@@ -903,7 +3723,7 @@ def batch_download(urls, directory="./downloads"):
         # Jika dict {url: filename}, abaikan filename dan gunakan directory yang sama
         url_directory_map = {url: directory for url in urls.keys()}
 
-    return batch_download_individual(url_directory_map)
+    return batch_download_individual(url_directory_map, max_parallel)
 
 def download_mixed_batch():
     """
@@ -982,13 +3802,1553 @@ def download_mixed_batch():
             print(f"   {i}. {platform.upper()}: {directory}")
             print(f"      └─ {url[:50]}...")
 
-    confirm = input(f"\n🚀 Mulai batch download {len(urls)} files? (y/n): ")
+    # Preflight semua URL sebelum bandwidth dipakai; item gagal dibuang
+    checks = preflight_batch(url_directory_map, report_path=PREFLIGHT_REPORT, downloader=downloader)
+    url_directory_map = {check['url']: check['directory'] for check in checks if check['ok']}
+    if not url_directory_map:
+        print("❌ Tidak ada URL yang lolos preflight")
+        return
+
+    confirm = input(f"\n🚀 Mulai batch download {len(url_directory_map)} files? (y/n): ")
     if confirm.lower() != 'y':
         print("❌ Batch download dibatalkan")
         return
 
+    parallel_input = input("⚡ Jumlah download paralel (Enter=1): ").strip()
+    max_parallel = int(parallel_input) if parallel_input.isdigit() and int(parallel_input) > 0 else 1
+
+    scheduler = BATCH_SCHEDULER
+    if max_parallel > 1:
+        # Urutan hanya berpengaruh ke waktu total jika ada beberapa slot paralel
+        order_input = input("🗓️  Urutkan largest-first / sebar per host (makespan)? (y/n, Enter=default): ").strip().lower()
+        if order_input in ('y', 'n'):
+            scheduler = 'makespan' if order_input == 'y' else 'fifo'
+
     # Execute batch download dengan individual directories
-    return batch_download_individual(url_directory_map)
+    return batch_download_individual(url_directory_map, max_parallel, scheduler=scheduler)
+
+# =============================================
+# PAGE CACHE WARMUP
+# =============================================
+
+MODEL_FILE_EXTENSIONS = ('.safetensors', '.sft', '.ckpt', '.pt', '.pth', '.bin', '.gguf', '.onnx')
+
+_LIBC = None
+
+def _format_bytes(bytes_size):
+    return UniversalDownloader.format_bytes(bytes_size)
+
+def _get_libc():
+    """Load libc via ctypes (Linux) untuk mmap/mincore, None jika tidak tersedia"""
+    global _LIBC
+    if _LIBC is None:
+        try:
+            _LIBC = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            _LIBC.mmap.restype = ctypes.c_void_p
+            _LIBC.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int,
+                                   ctypes.c_int, ctypes.c_int, ctypes.c_long]
+            _LIBC.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+            _LIBC.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+            if hasattr(_LIBC, 'sync_file_range'):
+                _LIBC.sync_file_range.argtypes = [ctypes.c_int, ctypes.c_longlong,
+                                                  ctypes.c_longlong, ctypes.c_uint]
+        except (OSError, AttributeError):
+            _LIBC = False
+    return _LIBC or None
+
+def page_cache_resident_bytes(path):
+    """Hitung berapa bytes file yang sedang ada di page cache (mincore), None jika tidak didukung"""
+    libc = _get_libc()
+    if libc is None or not hasattr(mmap, 'PROT_READ'):
+        return None
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+
+    page_size = mmap.PAGESIZE
+    pages = (size + page_size - 1) // page_size
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        address = libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            return None
+        try:
+            vector = (ctypes.c_ubyte * pages)()
+            if libc.mincore(address, size, vector) != 0:
+                return None
+            resident_pages = sum(byte & 1 for byte in vector)
+        finally:
+            libc.munmap(address, size)
+    finally:
+        os.close(fd)
+    return min(size, resident_pages * page_size)
+
+def read_meminfo(field):
+    """Ambil satu field dari /proc/meminfo (bytes), None jika tidak tersedia"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def get_available_memory():
+    """Ambil MemAvailable dari /proc/meminfo (bytes), None jika tidak tersedia"""
+    return read_meminfo('MemAvailable')
+
+def warmup_file(path, chunk_size=WARMUP_CHUNK_SIZE):
+    """Readahead satu file ke page cache: fadvise(WILLNEED) lalu baca berurutan"""
+    size = os.path.getsize(path)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            # Kernel mulai readahead untuk seluruh file secara async
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+        # Baca berurutan supaya selesai dijamin resident (sebagian besar sudah hit cache)
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        offset = 0
+        while offset < size:
+            read = os.preadv(fd, [view], offset) if hasattr(os, 'preadv') else os.readv(fd, [view])
+            if read <= 0:
+                break
+            offset += read
+            THROTTLE.pace(read)
+    finally:
+        os.close(fd)
+    return size
+
+def expand_model_paths(paths):
+    """Expand daftar file/direktori jadi daftar file model"""
+    files = []
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path, followlinks=True):
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.lower().endswith(MODEL_FILE_EXTENSIONS))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"⚠️ Path tidak ditemukan: {path}")
+    return files
+
+def warmup_files(paths, max_workers=WARMUP_WORKERS, memory_budget=None):
+    """
+    Pre-warm page cache untuk file model supaya load pertama ComfyUI cepat
+
+    Args:
+        paths: List file atau direktori model
+        max_workers: Jumlah file yang di-warmup paralel
+        memory_budget: Batas bytes yang boleh dibuat resident (default: WARMUP_MEMORY_FRACTION x MemAvailable)
+
+    Returns:
+        dict: {'files': count, 'skipped': [paths], 'bytes_requested': n, 'bytes_resident': n, 'time': detik}
+    """
+    files = expand_model_paths(paths)
+    if memory_budget is None:
+        available = get_available_memory()
+        memory_budget = int(available * WARMUP_MEMORY_FRACTION) if available else float('inf')
+
+    # Pilih file sesuai urutan sampai budget memori habis
+    selected, skipped, planned = [], [], 0
+    for path in files:
+        size = os.path.getsize(path)
+        if planned + size <= memory_budget:
+            selected.append(path)
+            planned += size
+        else:
+            skipped.append(path)
+
+    print(f"🔥 WARMUP PAGE CACHE: {len(selected)} file ({_format_bytes(planned)})")
+    if skipped:
+        print(f"⚠️ {len(skipped)} file dilewati karena melebihi budget memori "
+              f"({_format_bytes(memory_budget)})")
+
+    resident_before = {path: page_cache_resident_bytes(path) for path in selected}
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='warmup') as pool:
+        list(pool.map(warmup_file, selected))
+    elapsed = time.time() - start_time
+
+    resident_gain = 0
+    for path in selected:
+        after = page_cache_resident_bytes(path)
+        before = resident_before[path]
+        if after is None or before is None:
+            # mincore tidak tersedia: anggap seluruh file yang dibaca kini resident
+            resident_gain += os.path.getsize(path)
+        else:
+            resident_gain += max(0, after - before)
+
+    print(f"✅ Warmup selesai: {_format_bytes(resident_gain)} baru resident "
+          f"dalam {elapsed:.1f}s")
+    return {
+        'files': len(selected),
+        'skipped': skipped,
+        'bytes_requested': planned,
+        'bytes_resident': resident_gain,
+        'time': elapsed
+    }
+
+def warmup_manifest(manifest_path, max_workers=WARMUP_WORKERS, memory_budget=None):
+    """Warmup file yang ditandai "hot" di manifest (untuk pre-warm sebelum job)"""
+    downloader = UniversalDownloader()
+    paths = [manifest_entry_path(downloader, entry)
+             for entry in load_manifest(manifest_path) if entry.get('hot')]
+    return warmup_files([path for path in paths if path], max_workers, memory_budget)
+
+# =============================================
+# PAGE-CACHE-FRIENDLY WRITES
+# =============================================
+
+SYNC_FILE_RANGE_WAIT_BEFORE = 1
+SYNC_FILE_RANGE_WRITE = 2
+SYNC_FILE_RANGE_WAIT_AFTER = 4
+
+def _sync_file_range(fd, offset, nbytes, flags):
+    """sync_file_range(2) via libc; fallback fdatasync jika tidak tersedia (non-Linux)"""
+    libc = _get_libc()
+    if libc is not None and hasattr(libc, 'sync_file_range'):
+        if libc.sync_file_range(fd, offset, nbytes, flags) == 0:
+            return
+    if flags & SYNC_FILE_RANGE_WAIT_AFTER:
+        os.fdatasync(fd) if hasattr(os, 'fdatasync') else os.fsync(fd)
+
+def _drop_cache(fd, offset=0, length=0):
+    """fadvise(DONTNEED): buang page bersih dari cache (length 0 = sampai akhir file)"""
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_DONTNEED)
+
+def _flush_and_drop(fd, offset, length):
+    """Tunggu writeback range ini selesai lalu buang dari page cache (untuk tulisan non-sekuensial)"""
+    _sync_file_range(fd, offset, length,
+                     SYNC_FILE_RANGE_WAIT_BEFORE | SYNC_FILE_RANGE_WRITE | SYNC_FILE_RANGE_WAIT_AFTER)
+    _drop_cache(fd, offset, length)
+
+class CacheFriendlyWriter:
+    """
+    Writer file yang tidak menumpuk page cache
+
+    Data ditulis per chunk ter-align; writeback tiap chunk dimulai segera
+    (SYNC_FILE_RANGE_WRITE), chunk sebelumnya ditunggu selesai lalu di-drop dengan
+    fadvise(DONTNEED). Dirty + cache file ini dibatasi sekitar 2 x chunk_size.
+    """
+
+    def __init__(self, fd, offset=0, chunk_size=CACHE_FRIENDLY_CHUNK_SIZE):
+        self.fd = fd
+        self.chunk_size = max(mmap.PAGESIZE, chunk_size - chunk_size % mmap.PAGESIZE)
+        self.offset = offset
+        # Batas drop di-align ke page: page parsial pertama dibiarkan
+        self.flushed = offset - offset % mmap.PAGESIZE
+        self.pending = offset  # Awal range yang writeback-nya sudah dimulai tapi belum ditunggu
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            self._write_chunk(self.buffer[:self.chunk_size])
+            del self.buffer[:self.chunk_size]
+        return len(data)
+
+    def _write_chunk(self, chunk):
+        view = memoryview(chunk)
+        while view:
+            written = os.pwrite(self.fd, view, self.offset)
+            self.offset += written
+            view = view[written:]
+        # Selesaikan writeback chunk sebelumnya, lalu buang dari cache
+        if self.pending > self.flushed:
+            _sync_file_range(self.fd, self.flushed, self.pending - self.flushed,
+                             SYNC_FILE_RANGE_WAIT_BEFORE | SYNC_FILE_RANGE_WRITE | SYNC_FILE_RANGE_WAIT_AFTER)
+            _drop_cache(self.fd, self.flushed, self.pending - self.flushed)
+            self.flushed = self.pending
+        # Mulai writeback chunk ini secara async
+        _sync_file_range(self.fd, self.pending, self.offset - self.pending, SYNC_FILE_RANGE_WRITE)
+        self.pending = self.offset
+
+    def close(self):
+        if self.buffer:
+            self._write_chunk(bytes(self.buffer))
+            self.buffer.clear()
+        os.fdatasync(self.fd) if hasattr(os, 'fdatasync') else os.fsync(self.fd)
+        _drop_cache(self.fd)
+
+def copy_file_cache_friendly(source, destination, chunk_size=CACHE_FRIENDLY_CHUNK_SIZE):
+    """Copy file tanpa mengisi page cache (sumber dan tujuan), lalu salin metadata seperti copy2"""
+    src_fd = os.open(source, os.O_RDONLY)
+    dst_fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        writer = CacheFriendlyWriter(dst_fd, chunk_size=chunk_size)
+        offset = 0
+        while True:
+            chunk = os.pread(src_fd, chunk_size, offset)
+            if not chunk:
+                break
+            writer.write(chunk)
+            # Blob sumber bisa masih dirty (baru selesai di-download): flush dulu supaya bisa di-drop
+            _flush_and_drop(src_fd, offset, len(chunk))
+            offset += len(chunk)
+            THROTTLE.pace(len(chunk))
+        writer.close()
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+    shutil.copystat(source, destination)
+
+def enable_cache_friendly_writes():
+    """Aktifkan mode tulis cache-friendly global (download, replicate, extract, migrasi staging)"""
+    global CACHE_FRIENDLY_WRITES
+    CACHE_FRIENDLY_WRITES = True
+
+class CacheTrimmer:
+    """
+    Batasi page cache file yang ditulis proses lain (aria2): periodik mulai writeback
+    seluruh file lalu drop page yang sudah bersih dari putaran sebelumnya
+    """
+
+    def __init__(self, path, interval=CACHE_TRIM_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='cache-trim', daemon=True)
+        self.thread.start()
+        return self
+
+    def _trim(self):
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            # Dirty page milik inode, jadi fd terpisah cukup untuk flush & drop
+            _drop_cache(fd)
+            _sync_file_range(fd, 0, 0, SYNC_FILE_RANGE_WRITE)
+        finally:
+            os.close(fd)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._trim()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fdatasync(fd) if hasattr(os, 'fdatasync') else os.fsync(fd)
+            _drop_cache(fd)
+        finally:
+            os.close(fd)
+
+def page_cache_footprint():
+    """Total page cache sistem (Cached di /proc/meminfo, bytes), None jika tidak tersedia"""
+    return read_meminfo('Cached')
+
+# =============================================
+# SAFETENSORS VALIDATION
+# =============================================
+
+# Lebar bit per elemen untuk dtype safetensors (termasuk dtype sub-byte)
+SAFETENSORS_DTYPE_BITS = {
+    'BOOL': 8, 'U8': 8, 'I8': 8, 'F8_E4M3': 8, 'F8_E5M2': 8, 'F8_E8M0': 8,
+    'I16': 16, 'U16': 16, 'F16': 16, 'BF16': 16,
+    'I32': 32, 'U32': 32, 'F32': 32,
+    'I64': 64, 'U64': 64, 'F64': 64,
+    'F4': 4, 'F6_E2M3': 6, 'F6_E3M2': 6,
+}
+
+def detect_model_format(path):
+    """Deteksi format file model dari magic bytes: safetensors, zip (torch), gguf, pickle"""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    if head.startswith(b'PK\x03\x04'):
+        return 'zip'
+    if head.startswith(b'GGUF'):
+        return 'gguf'
+    if head[:1] == b'\x80':
+        return 'pickle'
+    if len(head) >= 9 and head[8:9] == b'{':
+        header_len = struct.unpack('<Q', head[:8])[0]
+        if header_len < os.path.getsize(path):
+            return 'safetensors'
+    return 'unknown'
+
+def _tensor_entry(name, info):
+    """Cek tipe satu entry header safetensors; return (dtype, shape, begin, end) atau raise ValueError"""
+    if not isinstance(info, dict) or not {'dtype', 'shape', 'data_offsets'} <= info.keys():
+        raise ValueError(f"entry tensor tidak lengkap: {name}")
+    dtype, shape, offsets = info['dtype'], info['shape'], info['data_offsets']
+    if not isinstance(dtype, str) or dtype not in SAFETENSORS_DTYPE_BITS:
+        raise ValueError(f"dtype tidak dikenal {dtype} pada {name}")
+    # bool adalah subclass int di Python, jadi dicek dengan type()
+    if not isinstance(shape, list) or not all(type(dim) is int and dim >= 0 for dim in shape):
+        raise ValueError(f"shape tidak valid pada {name}: {shape!r}")
+    if not isinstance(offsets, list) or len(offsets) != 2 or \
+            not all(type(offset) is int and offset >= 0 for offset in offsets) or offsets[0] > offsets[1]:
+        raise ValueError(f"data_offsets tidak valid pada {name}: {offsets!r}")
+    return dtype, shape, offsets[0], offsets[1]
+
+def validate_safetensors(path):
+    """
+    Validasi struktur .safetensors tanpa hashing: header harus valid dan offset
+    tensor (sesuai dtype x shape) harus menutup data section persis sampai akhir file
+
+    Returns:
+        tuple: (ok, pesan)
+    """
+    try:
+        size = os.path.getsize(path)
+        if size < 8:
+            return False, f"file terlalu kecil ({size} bytes)"
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_len = struct.unpack('<Q', mm[:8])[0]
+            if header_len > size - 8:
+                return False, f"header terpotong ({header_len} bytes diklaim, file {size} bytes)"
+            header = json.loads(mm[8:8 + header_len])
+    except (OSError, ValueError) as e:
+        return False, f"header tidak valid: {e}"
+
+    if not isinstance(header, dict):
+        return False, "header bukan JSON object"
+
+    data_len = size - 8 - header_len
+    spans = []
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        try:
+            dtype, shape, begin, end = _tensor_entry(name, info)
+        except ValueError as e:
+            return False, str(e)
+        elements = 1
+        for dim in shape:
+            elements *= dim
+        expected = (elements * SAFETENSORS_DTYPE_BITS[dtype] + 7) // 8
+        if end - begin != expected:
+            return False, f"ukuran {name} tidak cocok: {end - begin} bytes, seharusnya {expected}"
+        spans.append((begin, end, name))
+
+    # Tensor harus berurutan, tanpa celah/overlap, mulai dari 0
+    spans.sort()
+    position = 0
+    for begin, end, name in spans:
+        if begin != position:
+            return False, f"offset {name} tidak bersambung (mulai {begin}, seharusnya {position})"
+        position = end
+
+    if position > data_len:
+        return False, f"file terpotong: kurang {position - data_len} bytes"
+    if position < data_len:
+        return False, f"ada {data_len - position} bytes sisa setelah tensor terakhir (partial write?)"
+    return True, f"OK ({len(spans)} tensor)"
+
+def find_extra_model_paths():
+    """Cari extra_model_paths.yaml: instalasi ComfyUI dulu, lalu di samping script ini"""
+    candidates = [EXTRA_MODEL_PATHS_FILE,
+                  os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extra_model_paths.yaml')]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def load_model_paths(config_path=None):
+    """
+    Baca extra_model_paths.yaml jadi mapping kategori -> list direktori absolut
+
+    Returns:
+        dict: {'checkpoints': ['/root/volume/ComfyUI/models/checkpoints'], ...}
+    """
+    import yaml
+
+    config_path = config_path or find_extra_model_paths()
+    if not config_path:
+        return {}
+    with open(config_path, encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+
+    model_paths = {}
+    for section in config.values():
+        if not isinstance(section, dict):
+            continue
+        base_path = os.path.expanduser(section.get('base_path', ''))
+        for category, value in section.items():
+            if category in ('base_path', 'is_default') or not isinstance(value, str):
+                continue
+            for folder in value.splitlines():
+                folder = folder.strip()
+                if folder:
+                    model_paths.setdefault(category, []).append(os.path.join(base_path, folder))
+    return model_paths
+
+def validate_model_folders(paths=None, config_path=None, max_workers=None):
+    """
+    Validasi massal semua .safetensors di folder model (default: dari extra_model_paths.yaml)
+
+    Args:
+        paths: List file/direktori; None = semua folder di extra_model_paths.yaml
+        config_path: Path extra_model_paths.yaml (default: auto-detect)
+        max_workers: Jumlah proses validator (default: jumlah CPU)
+
+    Returns:
+        dict: {'checked': count, 'invalid': [(path, pesan)]}
+    """
+    if paths is None:
+        paths = sorted({folder for folders in load_model_paths(config_path).values() for folder in folders})
+    files = [path for path in expand_model_paths(paths) if path.lower().endswith(('.safetensors', '.sft'))]
+
+    print(f"🔎 VALIDASI SAFETENSORS: {len(files)} file")
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        outcomes = list(pool.map(validate_safetensors, files, chunksize=16))
+    elapsed = time.time() - start_time
+
+    invalid = [(path, message) for path, (ok, message) in zip(files, outcomes) if not ok]
+    for path, message in invalid:
+        print(f"❌ {path}: {message}")
+    print(f"✅ {len(files) - len(invalid)}/{len(files)} file valid ({elapsed:.1f}s)")
+    return {'checked': len(files), 'invalid': invalid}
+
+# =============================================
+# SELECTIVE TENSOR EXTRACTION (HTTP RANGE)
+# =============================================
+
+# Preset komponen checkpoint all-in-one: prefix nama tensor -> folder ComfyUI tujuan.
+# Prefix yang cocok dibuang dari nama tensor (format file standalone ComfyUI).
+TENSOR_EXTRACT_PRESETS = {
+    'vae': {'folder': 'vae', 'prefixes': ['first_stage_model.', 'vae.']},
+    'clip_l': {'folder': 'text_encoders', 'prefixes': ['cond_stage_model.transformer.',
+                                                       'conditioner.embedders.0.transformer.',
+                                                       'text_encoders.clip_l.transformer.']},
+    'clip_g': {'folder': 'text_encoders', 'prefixes': ['conditioner.embedders.1.model.',
+                                                       'text_encoders.clip_g.transformer.']},
+    't5xxl': {'folder': 'text_encoders', 'prefixes': ['text_encoders.t5xxl.transformer.']},
+    'diffusion_model': {'folder': 'diffusion_models', 'prefixes': ['model.diffusion_model.']},
+}
+
+def _range_request(url, start, end, headers=None, stream=False):
+    """Satu GET byte range [start, end] (inklusif) tanpa retry; server wajib menjawab 206"""
+    try:
+        response = HTTP_CLIENT.send('GET', url, headers=dict(headers or {}, Range=f'bytes={start}-{end}'),
+                                    stream=stream, allow_redirects=True)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise RetryableError(f"{type(e).__name__}: {e}")
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        response.close()
+        raise RetryableError(f"HTTP {response.status_code}", status_code=response.status_code,
+                             retry_after=parse_retry_after(response.headers.get('Retry-After')))
+    if response.status_code >= 400:
+        response.close()
+        response.raise_for_status()
+    if response.status_code != 206:
+        response.close()
+        raise ValueError("Server tidak mendukung HTTP Range")
+    return response
+
+def _range_read(url, start, end, headers=None):
+    """Byte range kecil (header) dengan retry; return (bytes, URL akhir)"""
+    def attempt():
+        response = _range_request(url, start, end, headers)
+        return response.content, response.url
+    return RETRY_MANAGER.call(url, attempt, f"range {start}-{end}")
+
+def fetch_safetensors_header(url, headers=None, probe_size=256 * 1024):
+    """
+    Baca header .safetensors remote lewat Range request
+
+    Returns:
+        tuple: (header dict, offset awal data section, URL akhir setelah redirect)
+
+    Raises:
+        ValueError: Header bukan safetensors atau entry tensor tidak valid
+    """
+    head, final_url = _range_read(url, 0, probe_size - 1, headers)
+    if len(head) < 8:
+        raise ValueError("Respon terlalu pendek untuk header safetensors")
+    header_len = struct.unpack('<Q', head[:8])[0]
+    if header_len > 100 * 1024**2:
+        raise ValueError(f"Bukan file safetensors (header {header_len} bytes)")
+    if len(head) < 8 + header_len:
+        # Header lebih besar dari probe: ambil sisanya dari URL akhir (tanpa redirect ulang)
+        head += _range_read(final_url, len(head), 8 + header_len - 1)[0]
+    header = json.loads(head[8:8 + header_len])
+    if not isinstance(header, dict):
+        raise ValueError("Header safetensors bukan JSON object")
+    # Header remote tidak dipercaya: cek tipe tiap entry sebelum offset-nya dipakai
+    for name, info in header.items():
+        if name == '__metadata__':
+            if info is not None and not isinstance(info, dict):
+                raise ValueError("__metadata__ bukan JSON object")
+        else:
+            _tensor_entry(name, info)
+    return header, 8 + header_len, final_url
+
+def select_tensors(header, prefixes, strip_prefix=True):
+    """Pilih tensor berdasarkan prefix nama; return list (nama lama, nama baru, info) urut offset"""
+    selected = []
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        prefix = next((prefix for prefix in prefixes if name.startswith(prefix)), None)
+        if prefix is not None:
+            selected.append((name, name[len(prefix):] if strip_prefix else name, info))
+    selected.sort(key=lambda item: item[2]['data_offsets'][0])
+    return selected
+
+def coalesce_ranges(spans, max_gap=EXTRACT_COALESCE_GAP):
+    """Gabungkan span (begin, end, payload) yang berdekatan jadi range [begin, end) + daftar payload"""
+    ranges = []
+    for begin, end, payload in sorted(spans, key=lambda span: span[0]):
+        if ranges and begin - ranges[-1][1] <= max_gap:
+            ranges[-1][1] = max(ranges[-1][1], end)
+            ranges[-1][2].append((begin, end, payload))
+        else:
+            ranges.append([begin, end, [(begin, end, payload)]])
+    return ranges
+
+def tensor_groups(header, depth=2):
+    """Ringkas tensor per prefix (depth komponen nama pertama) -> (jumlah, bytes)"""
+    groups = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        key = '.'.join(name.split('.')[:depth]) + '.'
+        begin, end = info['data_offsets']
+        count, size = groups.get(key, (0, 0))
+        groups[key] = (count + 1, size + end - begin)
+    return groups
+
+def extract_tensors(url, component=None, prefixes=None, output_dir=None, filename=None,
+                    strip_prefix=True, max_workers=EXTRACT_WORKERS, list_only=False):
+    """
+    Ambil sebagian tensor dari .safetensors remote (mis. hanya VAE dari checkpoint all-in-one)
+
+    Header dibaca lewat Range request, tensor dipilih per prefix/preset, byte range yang
+    berdekatan digabung, lalu hanya range itu yang di-download dan ditulis sebagai
+    .safetensors baru yang valid di folder ComfyUI yang sesuai.
+
+    Args:
+        url: URL file .safetensors (HF, CivitAI, atau URL langsung)
+        component: Nama preset di TENSOR_EXTRACT_PRESETS (vae, clip_l, clip_g, t5xxl, diffusion_model)
+        prefixes: List prefix nama tensor (menggantikan prefix preset)
+        output_dir: Folder tujuan (default: folder pertama kategori preset, atau checkpoints)
+        filename: Nama file output (default: <nama sumber>_<component>.safetensors)
+        strip_prefix: Buang prefix yang cocok dari nama tensor
+        max_workers: Jumlah range yang di-download paralel
+        list_only: Hanya tampilkan ringkasan grup tensor di header
+
+    Returns:
+        str: Path file hasil, atau None jika gagal / list_only
+    """
+    preset = TENSOR_EXTRACT_PRESETS.get(component) if component else None
+    if component and preset is None:
+        print(f"❌ Preset tidak dikenal: {component} (pilihan: {', '.join(TENSOR_EXTRACT_PRESETS)})")
+        return None
+    prefixes = prefixes or (preset['prefixes'] if preset else None)
+
+    downloader = UniversalDownloader()
+    platform = downloader.detect_platform(url)
+    headers = {}
+    request_url = url
+    if platform == 'civitai':
+        request_url = downloader.prepare_civitai_url(url, quiet=True)
+    elif platform == 'huggingface' and HF_TOKEN:
+        headers['Authorization'] = f'Bearer {HF_TOKEN}'
+
+    print(f"🧩 EXTRACT TENSOR: {url}")
+    try:
+        header, data_start, final_url = fetch_safetensors_header(request_url, headers)
+    except (requests.RequestException, RetryableError, ValueError) as e:
+        print(f"❌ Gagal membaca header: {e}")
+        return None
+
+    tensors = {name: info for name, info in header.items() if name != '__metadata__'}
+    total_bytes = sum(info['data_offsets'][1] - info['data_offsets'][0] for info in tensors.values())
+    print(f"📋 Header: {len(tensors)} tensor, {_format_bytes(total_bytes)} data")
+
+    if list_only or not prefixes:
+        for key, (count, size) in sorted(tensor_groups(header).items()):
+            print(f"   {key:<45} {count:>5} tensor {_format_bytes(size):>12}")
+        if not prefixes and not list_only:
+            print("❌ Pilih --component atau --prefix")
+        return None
+
+    selected = select_tensors(header, prefixes, strip_prefix)
+    if not selected:
+        print(f"❌ Tidak ada tensor dengan prefix: {', '.join(prefixes)}")
+        return None
+
+    # Layout baru: tensor terpilih dipadatkan berurutan
+    new_header = {}
+    spans = []
+    position = 0
+    for old_name, new_name, info in selected:
+        begin, end = info['data_offsets']
+        if new_name in new_header:
+            print(f"❌ Nama tensor bentrok setelah prefix dibuang: {new_name}")
+            return None
+        new_header[new_name] = {'dtype': info['dtype'], 'shape': info['shape'],
+                                'data_offsets': [position, position + end - begin]}
+        spans.append((begin, end, position))
+        position += end - begin
+    selected_bytes = position
+
+    metadata = dict(header.get('__metadata__') or {})
+    metadata.update({'extracted_from': url, 'extracted_prefixes': ','.join(prefixes)})
+    new_header['__metadata__'] = metadata
+    header_bytes = json.dumps(new_header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 8)  # Align data section ke 8 bytes
+    out_data_start = 8 + len(header_bytes)
+
+    ranges = coalesce_ranges(spans)
+    fetched_bytes = sum(end - begin for begin, end, _ in ranges)
+    print(f"🎯 Terpilih {len(selected)} tensor ({_format_bytes(selected_bytes)}, "
+          f"{selected_bytes / max(total_bytes, 1) * 100:.1f}% file) • {len(ranges)} range, "
+          f"download {_format_bytes(fetched_bytes)}")
+
+    if output_dir is None:
+        output_dir = model_category_folders(preset['folder'] if preset else 'checkpoints')[0]
+    if filename is None:
+        stem = os.path.splitext(unquote(os.path.basename(urlparse(url).path)))[0] or 'model'
+        filename = f"{stem}_{component or 'extract'}.safetensors"
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, filename)
+    part_path = output_path + '.part'
+
+    # Jangan timpa VAE / text encoder milik user tanpa konfirmasi
+    existing = downloader._check_existing(url, output_path, {'size': out_data_start + selected_bytes})
+    if existing is not None:
+        return output_path if existing else None
+
+    fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    start_time = time.time()
+    try:
+        os.pwrite(fd, struct.pack('<Q', len(header_bytes)) + header_bytes, 0)
+        os.ftruncate(fd, out_data_start + selected_bytes)
+
+        def fetch_range(range_begin, range_end, members):
+            response = _range_request(final_url, data_start + range_begin, data_start + range_end - 1,
+                                      stream=True)
+            position = range_begin
+            index = 0
+            dirty = [0, 0]  # Range output [awal, akhir) yang belum di-flush (mode cache-friendly)
+
+            def write_piece(data, offset):
+                os.pwrite(fd, data, offset)
+                if not CACHE_FRIENDLY_WRITES:
+                    return
+                if offset != dirty[1] or dirty[1] - dirty[0] >= CACHE_FRIENDLY_CHUNK_SIZE:
+                    if dirty[1] > dirty[0]:
+                        _flush_and_drop(fd, dirty[0], dirty[1] - dirty[0])
+                    dirty[0] = offset
+                dirty[1] = offset + len(data)
+
+            try:
+                with response:
+                    for chunk in response.iter_content(HTTP_DOWNLOAD_CHUNK_SIZE):
+                        chunk_end = position + len(chunk)
+                        # Tulis potongan chunk milik tensor terpilih; celah antar tensor dibuang
+                        while index < len(members) and members[index][0] < chunk_end:
+                            begin, end, destination = members[index]
+                            lo, hi = max(begin, position), min(end, chunk_end)
+                            if hi > lo:
+                                write_piece(chunk[lo - position:hi - position],
+                                            out_data_start + destination + lo - begin)
+                            if end > chunk_end:
+                                break
+                            index += 1
+                        position = chunk_end
+                        THROTTLE.pace(len(chunk))
+                if dirty[1] > dirty[0]:
+                    _flush_and_drop(fd, dirty[0], dirty[1] - dirty[0])
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                raise RetryableError(f"{type(e).__name__}: {e}")
+            if position != range_end:
+                raise RetryableError(f"range terpotong: {position - range_begin}/{range_end - range_begin} bytes")
+            return range_end - range_begin
+
+        def fetch(byte_range):
+            # Retry mengulang satu range penuh; pwrite ke offset tetap jadi aman diulang
+            return RETRY_MANAGER.call(final_url, lambda: fetch_range(*byte_range),
+                                      f"range {byte_range[0]}-{byte_range[1]}")
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract') as pool:
+            list(pool.map(fetch, ranges))
+        os.fsync(fd)
+        if CACHE_FRIENDLY_WRITES:
+            _drop_cache(fd)
+    except (requests.RequestException, RetryableError, ValueError, OSError) as e:
+        print(f"❌ Extract gagal: {e}")
+        os.close(fd)
+        os.remove(part_path)
+        return None
+    os.close(fd)
+
+    ok, message = validate_safetensors(part_path)
+    if not ok:
+        print(f"❌ Hasil tidak valid: {message}")
+        os.remove(part_path)
+        return None
+    os.replace(part_path, output_path)
+
+    elapsed = time.time() - start_time
+    print(f"🎉 {output_path} ({_format_bytes(os.path.getsize(output_path))}, {message}) "
+          f"dalam {elapsed:.1f}s, hemat {_format_bytes(total_bytes - fetched_bytes)}")
+    return output_path
+
+# =============================================
+# WORKFLOW PREFETCH
+# =============================================
+
+# Loader node ComfyUI: class_type -> [(nama input, index widget di format UI, kategori folder)]
+WORKFLOW_LOADER_NODES = {
+    'CheckpointLoaderSimple': [('ckpt_name', 0, 'checkpoints')],
+    'CheckpointLoader': [('ckpt_name', 1, 'checkpoints')],
+    'ImageOnlyCheckpointLoader': [('ckpt_name', 0, 'checkpoints')],
+    'unCLIPCheckpointLoader': [('ckpt_name', 0, 'checkpoints')],
+    'UNETLoader': [('unet_name', 0, 'diffusion_models')],
+    'UnetLoaderGGUF': [('unet_name', 0, 'diffusion_models')],
+    'CLIPLoader': [('clip_name', 0, 'text_encoders')],
+    'CLIPLoaderGGUF': [('clip_name', 0, 'text_encoders')],
+    'DualCLIPLoader': [('clip_name1', 0, 'text_encoders'), ('clip_name2', 1, 'text_encoders')],
+    'TripleCLIPLoader': [('clip_name1', 0, 'text_encoders'), ('clip_name2', 1, 'text_encoders'),
+                         ('clip_name3', 2, 'text_encoders')],
+    'QuadrupleCLIPLoader': [('clip_name1', 0, 'text_encoders'), ('clip_name2', 1, 'text_encoders'),
+                            ('clip_name3', 2, 'text_encoders'), ('clip_name4', 3, 'text_encoders')],
+    'VAELoader': [('vae_name', 0, 'vae')],
+    'LoraLoader': [('lora_name', 0, 'loras')],
+    'LoraLoaderModelOnly': [('lora_name', 0, 'loras')],
+    'ControlNetLoader': [('control_net_name', 0, 'controlnet')],
+    'DiffControlNetLoader': [('control_net_name', 0, 'controlnet')],
+    'UpscaleModelLoader': [('model_name', 0, 'upscale_models')],
+    'CLIPVisionLoader': [('clip_name', 0, 'clip_vision')],
+    'StyleModelLoader': [('style_model_name', 0, 'style_models')],
+    'GLIGENLoader': [('gligen_name', 0, 'gligen')],
+}
+
+# Folder lama yang juga dibaca ComfyUI untuk kategori yang sama
+MODEL_CATEGORY_ALIASES = {
+    'text_encoders': ['clip'],
+    'diffusion_models': ['unet'],
+}
+
+def _workflow_nodes(workflow):
+    """Iterasi node workflow format UI (termasuk subgraph) sebagai (class_type, inputs, widgets, node)"""
+    nodes = list(workflow.get('nodes', []))
+    for subgraph in (workflow.get('definitions') or {}).get('subgraphs', []):
+        nodes.extend(subgraph.get('nodes', []))
+    for node in nodes:
+        yield node.get('type'), {}, node.get('widgets_values'), node
+
+def safe_model_name(value):
+    """Nama model relatif dari workflow (boleh subfolder); None jika absolut atau mengandung '..'"""
+    name = value.replace('\\', '/')
+    if name.startswith('/') or re.match(r'^[A-Za-z]:', name):
+        return None
+    parts = [part for part in name.split('/') if part not in ('', '.')]
+    if not parts or '..' in parts:
+        return None
+    return '/'.join(parts)
+
+def extract_workflow_models(workflow):
+    """
+    Ambil daftar model dari workflow ComfyUI (format UI atau API)
+
+    Returns:
+        list: [{'filename': ..., 'category': ..., 'url': opsional dari properties.models}]
+    """
+    if 'nodes' in workflow:
+        nodes = _workflow_nodes(workflow)
+    else:
+        nodes = ((node.get('class_type'), node.get('inputs') or {}, None, node)
+                 for node in workflow.values() if isinstance(node, dict))
+
+    models = {}
+    for class_type, inputs, widgets, node in nodes:
+        for input_name, widget_index, category in WORKFLOW_LOADER_NODES.get(class_type, []):
+            value = inputs.get(input_name)
+            if value is None and isinstance(widgets, dict):
+                value = widgets.get(input_name)
+            elif value is None and isinstance(widgets, list) and widget_index < len(widgets):
+                value = widgets[widget_index]
+            # Input API yang berupa link ke node lain ([node_id, slot]) dilewati
+            if isinstance(value, str) and value:
+                # Workflow tidak dipercaya: nama tidak boleh keluar dari folder kategori
+                filename = safe_model_name(value)
+                if filename is None:
+                    print(f"⚠️ Nama model tidak aman dilewati: {value!r}")
+                    continue
+                models.setdefault((category, filename), {'filename': filename, 'category': category})
+
+        # Template ComfyUI menyertakan URL model di properties.models
+        for model in (node.get('properties') or {}).get('models', []):
+            for entry in models.values():
+                if os.path.basename(entry['filename']) == model.get('name') and model.get('url'):
+                    entry.setdefault('url', model['url'])
+    return list(models.values())
+
+def model_category_folders(category, model_paths=None):
+    """Daftar folder yang dibaca ComfyUI untuk satu kategori (extra_model_paths + default)"""
+    model_paths = load_model_paths() if model_paths is None else model_paths
+    folders = []
+    for name in [category] + MODEL_CATEGORY_ALIASES.get(category, []):
+        folders.extend(model_paths.get(name, []))
+        folders.append(os.path.join(COMFYUI_MODELS_DIR, name))
+    return list(dict.fromkeys(folders))
+
+def load_model_catalog(path):
+    """Load katalog filename -> URL (JSON; nilai berupa string URL atau dict dengan 'url')"""
+    with open(path, encoding='utf-8') as f:
+        catalog = json.load(f)
+    return {name: (value['url'] if isinstance(value, dict) else value) for name, value in catalog.items()}
+
+def prefetch_workflows(workflow_paths, catalog_path=None, max_parallel=4, config_path=None, dry_run=False,
+                       staging_dir=None):
+    """
+    Baca workflow ComfyUI, cek model yang belum ada di folder model, lalu download paralel
+
+    Args:
+        workflow_paths: List file workflow JSON (format UI atau API)
+        catalog_path: File JSON {filename: url} untuk model yang tidak punya URL di workflow
+        max_parallel: Jumlah transfer paralel
+        config_path: Path extra_model_paths.yaml (default: auto-detect)
+        dry_run: Jika True hanya tampilkan rencana tanpa download
+        staging_dir: Scratch lokal untuk tiered storage (default: STAGING_DIR)
+
+    Returns:
+        dict: {'present': [...], 'missing': [...], 'unresolved': [...], 'batch': hasil batch atau None}
+    """
+    model_paths = load_model_paths(config_path)
+    catalog = load_model_catalog(catalog_path) if catalog_path else {}
+
+    required = {}
+    for path in workflow_paths:
+        with open(path, encoding='utf-8') as f:
+            for model in extract_workflow_models(json.load(f)):
+                required.setdefault((model['category'], model['filename']), model)
+
+    present, missing, unresolved = [], [], []
+    for (category, filename), model in sorted(required.items()):
+        folders = model_category_folders(category, model_paths)
+        if any(os.path.exists(os.path.join(folder, filename)) for folder in folders):
+            present.append(model)
+            continue
+        url = catalog.get(filename) or catalog.get(os.path.basename(filename)) or model.get('url')
+        if not url:
+            unresolved.append(model)
+            continue
+        # Simpan di folder pertama kategori, pertahankan subfolder dari nama di workflow
+        root = os.path.abspath(folders[0])
+        target = os.path.normpath(os.path.join(root, os.path.dirname(filename)))
+        if os.path.commonpath([root, target]) != root:
+            print(f"⚠️ {filename} keluar dari folder {category}, dilewati")
+            continue
+        missing.append({'url': url, 'directory': target, 'filename': os.path.basename(filename),
+                        'category': category})
+
+    print(f"\n🧩 PREFETCH WORKFLOW: {len(required)} model dirujuk")
+    print(f"✅ Sudah ada: {len(present)}")
+    print(f"📥 Perlu download: {len(missing)}")
+    for entry in missing:
+        print(f"   • [{entry['category']}] {entry['filename']}")
+    if unresolved:
+        print(f"⚠️ Tidak ada URL di katalog: {len(unresolved)}")
+        for model in unresolved:
+            print(f"   • [{model['category']}] {model['filename']}")
+
+    batch = None
+    if missing and not dry_run:
+        batch = batch_download_individual(missing, max_parallel, staging_dir)
+    return {'present': present, 'missing': missing, 'unresolved': unresolved, 'batch': batch}
+
+# =============================================
+# LOCAL REPLICATION
+# =============================================
+
+FICLONE = 0x40049409  # ioctl reflink (btrfs, XFS, bcachefs, ...)
+
+def model_inventory(root):
+    """Inventaris file model di bawah root: {path relatif: ukuran}"""
+    root = os.path.abspath(os.path.expanduser(root))
+    return {os.path.relpath(path, root): os.path.getsize(path) for path in expand_model_paths([root])}
+
+def _sha256_file(path, chunk_size=WARMUP_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _reflink(src_fd, dst_fd):
+    """Clone extent sumber ke tujuan (copy-on-write, instan); False jika FS tidak mendukung"""
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+def clone_file(src, dst, chunk_size=REPLICATE_CHUNK_SIZE):
+    """
+    Copy satu file lokal lewat reflink, os.copy_file_range, atau read/write biasa
+
+    Ditulis ke dst.part lalu di-rename; .part yang tertinggal dari run sebelumnya
+    dilanjutkan dari offset terakhir. Dengan CACHE_FRIENDLY_WRITES tiap chunk
+    di-flush dan di-drop dari page cache.
+
+    Returns:
+        tuple: (metode, bytes yang benar-benar disalin)
+    """
+    size = os.path.getsize(src)
+    part_path = dst + '.part'
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset > size:
+        offset = 0
+
+    src_fd = os.open(src, os.O_RDONLY)
+    dst_fd = os.open(part_path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        if offset == 0 and _reflink(src_fd, dst_fd):
+            method = 'reflink'
+        else:
+            os.ftruncate(dst_fd, offset)
+            method = 'copy_file_range' if hasattr(os, 'copy_file_range') else 'read_write'
+            position = offset
+            while position < size:
+                count = min(chunk_size, size - position)
+                if method == 'copy_file_range':
+                    try:
+                        copied = os.copy_file_range(src_fd, dst_fd, count, position, position)
+                    except OSError:
+                        # Kernel lama / beda filesystem: fallback tanpa mengulang dari awal
+                        method = 'read_write'
+                        continue
+                else:
+                    copied = os.pwrite(dst_fd, os.pread(src_fd, count, position), position)
+                if copied <= 0:
+                    break
+                if CACHE_FRIENDLY_WRITES:
+                    # Jangan biarkan copy besar mengusir model yang resident di page cache
+                    _flush_and_drop(dst_fd, position, copied)
+                    _drop_cache(src_fd, position, copied)
+                position += copied
+                THROTTLE.pace(copied)
+            if position != size:
+                raise OSError(f"Copy tidak lengkap: {position}/{size} bytes")
+        os.fsync(dst_fd)
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+
+    shutil.copystat(src, part_path)
+    os.replace(part_path, dst)
+    return method, 0 if method == 'reflink' else size - offset
+
+def replicate(source, target, max_workers=REPLICATE_WORKERS, verify='size', dry_run=False):
+    """
+    Replikasi set model dari satu volume/direktori ke yang lain, hanya file yang kurang
+
+    Args:
+        source: Root model sumber (layout sama dengan target, mis. .../ComfyUI/models)
+        target: Root model tujuan
+        max_workers: Jumlah file yang disalin paralel
+        verify: "size" (bandingkan ukuran) atau "hash" (sha256 untuk file berukuran sama)
+        dry_run: Jika True, hanya tampilkan rencana
+
+    Returns:
+        dict: {'copied': n, 'skipped': n, 'failed': [relpath], 'bytes': n, 'methods': {metode: n}, 'time': detik}
+    """
+    source = os.path.abspath(os.path.expanduser(source))
+    target = os.path.abspath(os.path.expanduser(target))
+    start_time = time.time()
+    source_files = model_inventory(source)
+    target_files = model_inventory(target)
+
+    def needs_copy(relpath):
+        target_size = target_files.get(relpath)
+        if target_size != source_files[relpath]:
+            return True
+        return verify == 'hash' and \
+            _sha256_file(os.path.join(source, relpath)) != _sha256_file(os.path.join(target, relpath))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='replicate') as pool:
+        relpaths = sorted(source_files)
+        missing = [relpath for relpath, copy in zip(relpaths, pool.map(needs_copy, relpaths)) if copy]
+
+    total_bytes = sum(source_files[relpath] for relpath in missing)
+    print(f"🔁 REPLICATE: {source} -> {target}")
+    print(f"📊 Sumber {len(source_files)} file • tujuan {len(target_files)} file • "
+          f"perlu disalin {len(missing)} ({_format_bytes(total_bytes)})")
+    summary = {'copied': 0, 'skipped': len(source_files) - len(missing), 'failed': [],
+               'bytes': 0, 'methods': {}, 'time': 0.0}
+    if dry_run or not missing:
+        for relpath in missing:
+            print(f"   • {relpath} ({_format_bytes(source_files[relpath])})")
+        return summary
+
+    def copy(relpath):
+        return clone_file(os.path.join(source, relpath), os.path.join(target, relpath))
+
+    # File terbesar dulu supaya ekor run tidak ditahan satu file besar
+    missing.sort(key=source_files.get, reverse=True)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='replicate') as pool:
+        futures = {pool.submit(copy, relpath): relpath for relpath in missing}
+        for future in futures:
+            relpath = futures[future]
+            try:
+                method, copied = future.result()
+            except OSError as e:
+                print(f"   ❌ {relpath}: {e}")
+                summary['failed'].append(relpath)
+                continue
+            summary['copied'] += 1
+            summary['bytes'] += copied
+            summary['methods'][method] = summary['methods'].get(method, 0) + 1
+            print(f"   ✅ {relpath} ({_format_bytes(source_files[relpath])}, {method})")
+
+    summary['time'] = time.time() - start_time
+    methods = ', '.join(f"{method} {count}" for method, count in summary['methods'].items())
+    print(f"🎉 {summary['copied']} file disalin ({methods or '-'}) • {summary['skipped']} sudah ada • "
+          f"{len(summary['failed'])} gagal • {_format_bytes(summary['bytes'])} data dalam "
+          f"{summary['time']:.1f}s")
+    return summary
+
+class LocalSourceIndex:
+    """Index nama file -> path di LOCAL_SOURCES, dibangun sekali saat pertama dipakai"""
+
+    def __init__(self, roots):
+        self.roots = roots
+        self.files = None
+        self.lock = threading.Lock()
+
+    def find(self, filename, size):
+        """Path lokal dengan nama dan ukuran yang sama, atau None"""
+        if not filename or not size:
+            return None
+        with self.lock:
+            if self.files is None:
+                self.files = {}
+                for path in expand_model_paths([root for root in self.roots if os.path.isdir(root)]):
+                    self.files.setdefault(os.path.basename(path), []).append(path)
+        for path in self.files.get(filename, []):
+            try:
+                if os.path.getsize(path) == size:
+                    return path
+            except OSError:
+                continue
+        return None
+
+_LOCAL_SOURCE_INDEX = None
+
+def get_local_source_index():
+    """Satu LocalSourceIndex per proses (None jika LOCAL_SOURCES kosong)"""
+    global _LOCAL_SOURCE_INDEX
+    if not LOCAL_SOURCES:
+        return None
+    if _LOCAL_SOURCE_INDEX is None:
+        _LOCAL_SOURCE_INDEX = LocalSourceIndex([os.path.expanduser(root) for root in LOCAL_SOURCES])
+    return _LOCAL_SOURCE_INDEX
+
+# =============================================
+# DOWNLOAD DAEMON
+# =============================================
+
+class DaemonProgressSink:
+    """Pengganti ProgressRenderer di daemon: event progress diteruskan ke job & stream event"""
+
+    def __init__(self, daemon):
+        self.daemon = daemon
+
+    def update(self, item_id, **fields):
+        self.daemon.on_progress(item_id, fields)
+
+    def paused(self):
+        return nullcontext()
+
+class DownloadDaemon:
+    """Daemon download: satu UniversalDownloader hangat, antrean job persisten, API lokal"""
+
+    def __init__(self, state_dir=DAEMON_STATE_DIR, workers=DAEMON_WORKERS):
+        self.state_dir = state_dir
+        self.state_file = os.path.join(state_dir, 'jobs.json')
+        self.workers = workers
+        self.downloader = UniversalDownloader(progress=DaemonProgressSink(self))
+        self.downloader.interactive = False
+        self.token = daemon_token(create=True)
+        self.jobs = {}
+        self.running_urls = {}
+        self.condition = threading.Condition()
+        self.subscribers = []
+        self.stop_event = threading.Event()
+        os.makedirs(state_dir, exist_ok=True)
+        self._load_state()
+
+    # ---------- Persistensi ----------
+
+    def _load_state(self):
+        """Load antrean dari disk; job yang terputus saat running dikembalikan ke queued"""
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                jobs = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ State daemon tidak bisa dibaca: {e}")
+            return
+        for job in jobs:
+            if job['status'] == 'running':
+                job['status'] = 'queued'
+            self.jobs[job['id']] = job
+        queued = sum(1 for job in self.jobs.values() if job['status'] == 'queued')
+        if queued:
+            print(f"♻️  {queued} job dilanjutkan dari sesi sebelumnya")
+
+    def _save_state(self):
+        """Tulis antrean ke disk secara atomic (dipanggil dengan condition terkunci)"""
+        tmp_path = self.state_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.jobs.values()), f, indent=1)
+        os.replace(tmp_path, self.state_file)
+
+    # ---------- Event ----------
+
+    def publish(self, event):
+        event['time'] = time.time()
+        for subscriber in list(self.subscribers):
+            subscriber.put(event)
+
+    def subscribe(self):
+        subscriber = queue.Queue()
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def on_progress(self, url, fields):
+        job_id = self.running_urls.get(url)
+        if job_id is None:
+            return
+        with self.condition:
+            job = self.jobs[job_id]
+            for key in ('downloaded', 'total', 'speed'):
+                if fields.get(key) is not None:
+                    job[key] = fields[key]
+        self.publish({'type': 'progress', 'job': job_id, **fields})
+
+    # ---------- Job API ----------
+
+    def enqueue(self, url, directory, filename=None):
+        """Tambah job ke antrean, return dict job"""
+        job = {
+            'id': uuid.uuid4().hex[:12], 'url': url, 'directory': directory, 'filename': filename,
+            'status': 'queued', 'created': time.time(), 'started': None, 'finished': None,
+            'downloaded': 0, 'total': None, 'speed': None, 'filepath': None,
+        }
+        with self.condition:
+            self.jobs[job['id']] = job
+            self._save_state()
+            self.condition.notify()
+        # Metadata di-resolve sekarang, selagi job menunggu worker
+        self.downloader.prefetch_metadata([url])
+        self.publish({'type': 'queued', 'job': job['id'], 'url': url})
+        return dict(job)
+
+    def get_job(self, job_id):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        with self.condition:
+            return [dict(job) for job in self.jobs.values()]
+
+    def cancel(self, job_id):
+        """Batalkan job queued/running, return job atau None jika tidak ada"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] == 'queued':
+                job['status'] = 'cancelled'
+                job['finished'] = time.time()
+            elif job['status'] == 'running':
+                job['status'] = 'cancelling'
+                self.downloader.cancel_transfer(job['url'])
+            self._save_state()
+        self.publish({'type': 'cancel', 'job': job_id})
+        return dict(job)
+
+    def stats(self):
+        with self.condition:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'jobs': counts, 'retry': RETRY_MANAGER.snapshot(), 'http': HTTP_CLIENT.stats()}
+
+    # ---------- Worker ----------
+
+    def _next_job(self):
+        with self.condition:
+            while not self.stop_event.is_set():
+                for job in self.jobs.values():
+                    # URL yang sama tidak boleh ditransfer dua worker sekaligus
+                    if job['status'] == 'queued' and job['url'] not in self.running_urls:
+                        job['status'] = 'running'
+                        job['started'] = time.time()
+                        self.running_urls[job['url']] = job['id']
+                        self._save_state()
+                        return job
+                self.condition.wait(timeout=1.0)
+        return None
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            job = self._next_job()
+            if job is None:
+                return
+            self.publish({'type': 'started', 'job': job['id'], 'url': job['url']})
+            try:
+                success = self.downloader.download_file(job['url'], job['directory'], job['filename'])
+            except Exception as e:
+                print(f"❌ Job {job['id']} error: {e}")
+                success = False
+            with self.condition:
+                self.running_urls.pop(job['url'], None)
+                cancelled = job['url'] in self.downloader.cancelled_urls
+                if job['status'] == 'cancelling' and cancelled and not success:
+                    job['status'] = 'cancelled'
+                else:
+                    # Cancel datang terlambat (transfer sudah selesai): laporkan hasil sebenarnya
+                    job['status'] = 'done' if success else 'failed'
+                job['finished'] = time.time()
+                job['filepath'] = self.downloader.completed_paths.get(job['url']) if success else None
+                # Daemon hidup lama: state per-URL dibuang supaya tidak tumbuh terus dan submit
+                # ulang URL yang sama me-resolve metadata baru (bukan None dari kegagalan sementara)
+                self.downloader.forget(job['url'])
+                self._save_state()
+                self.condition.notify_all()
+            self.publish({'type': job['status'], 'job': job['id'], 'filepath': job['filepath']})
+
+    def start_workers(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f'daemon-worker-{i}', daemon=True).start()
+
+    def serve(self, socket_path=None, host=DAEMON_HOST, port=DAEMON_PORT):
+        """Jalankan worker dan API (Unix socket jika socket_path diberikan, selain itu HTTP lokal)"""
+        self.start_workers()
+        handler = type('BoundDaemonRequestHandler', (DaemonRequestHandler,), {'daemon': self})
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = UnixHTTPServer(socket_path, handler)
+            print(f"🛰️  Daemon aktif di unix://{socket_path}")
+        else:
+            server = ThreadingHTTPServer((host, port), handler)
+            print(f"🛰️  Daemon aktif di http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Daemon dihentikan.")
+        finally:
+            self.stop_event.set()
+            with self.condition:
+                self.condition.notify_all()
+            server.server_close()
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server di atas Unix domain socket"""
+    daemon_threads = True
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """Endpoint: POST /jobs, GET /jobs, GET /jobs/<id>, DELETE /jobs/<id>, GET /events, GET /stats"""
+    daemon = None
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # client_address kosong pada Unix socket
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_id(self):
+        parts = self.path.strip('/').split('/')
+        return parts[1] if len(parts) == 2 and parts[0] == 'jobs' else None
+
+    def _authorized(self):
+        """Tolak request dari browser (ada header Origin) dan request tanpa token daemon"""
+        if self.headers.get('Origin'):
+            self._send_json(403, {'error': 'request dari browser ditolak'})
+            return False
+        supplied = self.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {self.daemon.token}'.encode('utf-8')):
+            self._send_json(401, {'error': 'token daemon tidak valid'})
+            return False
+        return True
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip('/') != '/jobs':
+            return self._send_json(404, {'error': 'not found'})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            job = self.daemon.enqueue(payload['url'], payload['directory'], payload.get('filename'))
+        except (ValueError, KeyError) as e:
+            return self._send_json(400, {'error': f'payload tidak valid: {e}'})
+        self._send_json(201, job)
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        job = self.daemon.cancel(self._job_id())
+        self._send_json(200 if job else 404, job or {'error': 'job tidak ditemukan'})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path = self.path.rstrip('/')
+        if path == '/jobs':
+            return self._send_json(200, self.daemon.list_jobs())
+        if path == '/stats':
+            return self._send_json(200, self.daemon.stats())
+        if path == '/events':
+            return self._stream_events()
+        job_id = self._job_id()
+        job = self.daemon.get_job(job_id) if job_id else None
+        self._send_json(200 if job else 404, job or {'error': 'job tidak ditemukan'})
+
+    def _stream_events(self):
+        """Stream event sebagai NDJSON (chunked) sampai client memutus koneksi"""
+        subscriber = self.daemon.subscribe()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            while not self.daemon.stop_event.is_set():
+                try:
+                    event = subscriber.get(timeout=15)
+                except queue.Empty:
+                    event = {'type': 'heartbeat', 'time': time.time()}
+                line = (json.dumps(event) + '\n').encode('utf-8')
+                self.wfile.write(f"{len(line):X}\r\n".encode('ascii') + line + b"\r\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.daemon.unsubscribe(subscriber)
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class DaemonClient:
+    """Client untuk DownloadDaemon (dipakai custom node ComfyUI / orkestrasi)"""
+
+    def __init__(self, socket_path=None, host=DAEMON_HOST, port=DAEMON_PORT, timeout=30, token=None):
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.token = token or daemon_token()
+
+    def _connection(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        if self.socket_path:
+            return _UnixHTTPConnection(self.socket_path, timeout=timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _request(self, method, path, payload=None):
+        connection = self._connection()
+        try:
+            body = json.dumps(payload) if payload is not None else None
+            headers = {'Authorization': f'Bearer {self.token}'}
+            if body:
+                headers['Content-Type'] = 'application/json'
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b'null')
+            if response.status >= 400:
+                raise RuntimeError(data.get('error') if isinstance(data, dict) else response.reason)
+            return data
+        finally:
+            connection.close()
+
+    def enqueue(self, url, directory, filename=None):
+        return self._request('POST', '/jobs', {'url': url, 'directory': directory, 'filename': filename})
+
+    def status(self, job_id=None):
+        return self._request('GET', f'/jobs/{job_id}' if job_id else '/jobs')
+
+    def cancel(self, job_id):
+        return self._request('DELETE', f'/jobs/{job_id}')
+
+    def stats(self):
+        return self._request('GET', '/stats')
+
+    def events(self):
+        """Generator event dari daemon (blocking)"""
+        connection = self._connection(timeout=None)
+        try:
+            connection.request('GET', '/events', headers={'Authorization': f'Bearer {self.token}'})
+            response = connection.getresponse()
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            connection.close()
+
+def daemon_token(create=False, path=DAEMON_TOKEN_FILE):
+    """Baca shared secret API daemon; buat baru (mode 0600) jika create dan belum ada"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            token = f.read().strip()
+    except OSError:
+        token = ''
+    if token:
+        return token
+    if not create:
+        raise RuntimeError(f"Token daemon tidak ditemukan di {path} (daemon belum pernah dijalankan?)")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    token = secrets.token_hex(16)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token + '\n')
+    return token
+
+def run_daemon(socket_path=None, host=DAEMON_HOST, port=DAEMON_PORT, workers=DAEMON_WORKERS):
+    """Jalankan daemon download sampai dihentikan (Ctrl+C)"""
+    DownloadDaemon(workers=workers).serve(socket_path, host, port)
 
 # =============================================
 # HELPER FUNCTIONS
@@ -1024,6 +5384,7 @@ def show_configuration():
     print(f"🤗 Hugging Face Token: {'✅ Configured' if HF_TOKEN else '❌ Not set'}")
     print(f"🎨 CivitAI Token: {'✅ Configured' if CIVITAI_TOKEN else '❌ Not set'}")
     print(f"👤 HF Username: {HF_USERNAME}")
+    print(f"⚙️  Engine: {', '.join(f'{key}={value}' for key, value in DOWNLOAD_ENGINES.items())}")
     print("=" * 50)
 
     if not HF_TOKEN:
@@ -1044,9 +5405,11 @@ def interactive_menu():
         print("2. 📦 Batch Download (Multiple URLs)")
         print("3. 🌐 Show Supported Platforms")
         print("4. ⚙️  Show Configuration")
-        print("5. 🚪 Exit")
+        print("5. 🔥 Warmup Page Cache (Pre-load Models)")
+        print("6. 🔎 Validasi File Safetensors")
+        print("7. 🚪 Exit")
 
-        choice = input("\nPilih menu (1-5): ").strip()
+        choice = input("\nPilih menu (1-7): ").strip()
 
         if choice == '1':
             main()
@@ -1057,10 +5420,206 @@ def interactive_menu():
         elif choice == '4':
             show_configuration()
         elif choice == '5':
+            paths = input("📁 File/direktori model (pisahkan dengan spasi): ").split()
+            if paths:
+                warmup_files(paths)
+        elif choice == '6':
+            paths = input("📁 File/direktori (Enter=semua folder extra_model_paths.yaml): ").split()
+            validate_model_folders(paths or None)
+        elif choice == '7':
             print("👋 Terima kasih telah menggunakan Universal Downloader!")
             break
         else:
-            print("❌ Pilihan tidak valid! Pilih 1-5.")
+            print("❌ Pilihan tidak valid! Pilih 1-7.")
+
+def main_cli(argv=None):
+    """Entry point command line; tanpa argumen menjalankan menu interaktif"""
+    parser = argparse.ArgumentParser(description="Universal AI Model Downloader")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Opsi profiling yang dipakai bersama oleh subcommand download/batch/prefetch
+    profile_options = argparse.ArgumentParser(add_help=False)
+    profile_options.add_argument('--profile', action='store_true', help='Ukur waktu tiap fase download')
+    profile_options.add_argument('--trace', default='profile_trace.json', help='Path output Chrome trace JSON')
+    profile_options.add_argument('--cprofile', metavar='PATH', help='Bungkus run dengan cProfile, simpan stats ke PATH')
+
+    # Opsi untuk node ComfyUI yang sedang melayani (mengalah saat inference, jaga page cache)
+    throttle_options = argparse.ArgumentParser(add_help=False)
+    throttle_options.add_argument('--yield-to-comfyui', action='store_true',
+                                  help='Perlambat transfer & I/O selama ComfyUI mengeksekusi prompt')
+    throttle_options.add_argument('--comfyui-url', help=f'Endpoint ComfyUI (default: {COMFYUI_URL})')
+    throttle_options.add_argument('--busy-flag', metavar='PATH', help='Pakai file flag sebagai sinyal busy')
+
+    # Hanya untuk subcommand yang menulis file (warmup justru bertujuan mengisi page cache)
+    cache_options = argparse.ArgumentParser(add_help=False)
+    cache_options.add_argument('--cache-friendly', action='store_true',
+                               help='Tulis file tanpa mengusir model yang resident di page cache')
+
+    download_parser = subparsers.add_parser('download', parents=[profile_options, throttle_options, cache_options], help='Download satu URL')
+    download_parser.add_argument('url')
+    download_parser.add_argument('directory')
+    download_parser.add_argument('--filename')
+
+    batch_parser = subparsers.add_parser('batch', parents=[profile_options, throttle_options, cache_options],
+                                         help='Download semua entry di manifest JSON/JSONL')
+    batch_parser.add_argument('manifest')
+    batch_parser.add_argument('--parallel', type=int, default=1, help='Jumlah transfer paralel')
+    batch_parser.add_argument('--warmup', action='store_true', help='Warmup page cache untuk entry "hot"')
+    batch_parser.add_argument('--stage-dir', help='Download ke scratch lokal lalu migrasi ke volume')
+    batch_parser.add_argument('--preflight', action='store_true',
+                              help='Cek semua URL (auth, ukuran, Range) dulu dan buang item yang gagal')
+    batch_parser.add_argument('--preflight-report', help='Path report JSON hasil preflight')
+    batch_parser.add_argument('--scheduler', choices=['fifo', 'makespan'],
+                              help='Urutan eksekusi: fifo (manifest) atau makespan (largest-first + sebar per host)')
+    batch_parser.add_argument('--stream', action='store_true',
+                              help='Mode streaming memori konstan (manifest dibaca lazy, hasil ke report JSONL)')
+    batch_parser.add_argument('--report', default='batch_report.jsonl', help='Path report JSONL mode streaming')
+    batch_parser.add_argument('--window', type=int, help='Jumlah item in-flight maksimal mode streaming')
+
+    warmup_parser = subparsers.add_parser('warmup', parents=[throttle_options], help='Pre-warm page cache untuk file model')
+    warmup_parser.add_argument('paths', nargs='*', help='File atau direktori model')
+    warmup_parser.add_argument('--manifest', help='Warmup entry "hot" dari manifest')
+    warmup_parser.add_argument('--budget-gb', type=float, help='Batas memori yang boleh dipakai (GB)')
+    warmup_parser.add_argument('--workers', type=int, default=WARMUP_WORKERS)
+
+    validate_parser = subparsers.add_parser('validate', help='Validasi struktur file .safetensors')
+    validate_parser.add_argument('paths', nargs='*', help='File/direktori (default: folder extra_model_paths.yaml)')
+    validate_parser.add_argument('--config', help='Path extra_model_paths.yaml')
+    validate_parser.add_argument('--workers', type=int, help='Jumlah proses validator')
+
+    daemon_parser = subparsers.add_parser('daemon', parents=[throttle_options, cache_options], help='Jalankan daemon download (job queue + API lokal)')
+    daemon_parser.add_argument('--socket', nargs='?', const=DAEMON_SOCKET, help='Pakai Unix socket (default path jika tanpa nilai)')
+    daemon_parser.add_argument('--host', default=DAEMON_HOST)
+    daemon_parser.add_argument('--port', type=int, default=DAEMON_PORT)
+    daemon_parser.add_argument('--workers', type=int, default=DAEMON_WORKERS)
+
+    submit_parser = subparsers.add_parser('submit', help='Kirim job ke daemon yang sedang berjalan')
+    submit_parser.add_argument('url')
+    submit_parser.add_argument('directory')
+    submit_parser.add_argument('--filename')
+    submit_parser.add_argument('--socket', nargs='?', const=DAEMON_SOCKET)
+    submit_parser.add_argument('--port', type=int, default=DAEMON_PORT)
+
+    prefetch_parser = subparsers.add_parser('prefetch', parents=[profile_options, throttle_options, cache_options],
+                                            help='Download model yang dibutuhkan workflow ComfyUI')
+    prefetch_parser.add_argument('workflows', nargs='+', help='File workflow JSON (format UI/API)')
+    prefetch_parser.add_argument('--catalog', help='File JSON {filename: url}')
+    prefetch_parser.add_argument('--parallel', type=int, default=4)
+    prefetch_parser.add_argument('--config', help='Path extra_model_paths.yaml')
+    prefetch_parser.add_argument('--dry-run', action='store_true', help='Hanya tampilkan model yang hilang')
+    prefetch_parser.add_argument('--stage-dir', help='Download ke scratch lokal lalu migrasi ke volume')
+
+    replicate_parser = subparsers.add_parser('replicate', parents=[throttle_options, cache_options], help='Salin model yang belum ada dari volume lain')
+    replicate_parser.add_argument('source', help='Root model sumber (mis. /mnt/vol1/ComfyUI/models)')
+    replicate_parser.add_argument('target', help='Root model tujuan dengan layout yang sama')
+    replicate_parser.add_argument('--workers', type=int, default=REPLICATE_WORKERS, help='Jumlah file paralel')
+    replicate_parser.add_argument('--verify', choices=['size', 'hash'], default='size',
+                                  help='Bandingkan inventaris berdasarkan ukuran atau sha256')
+    replicate_parser.add_argument('--dry-run', action='store_true', help='Hanya tampilkan file yang akan disalin')
+
+    extract_parser = subparsers.add_parser('extract', parents=[throttle_options, cache_options],
+                                           help='Ambil sebagian tensor (mis. VAE) dari .safetensors remote')
+    extract_parser.add_argument('url')
+    extract_parser.add_argument('--component', choices=list(TENSOR_EXTRACT_PRESETS),
+                                help='Preset komponen (menentukan prefix & folder tujuan)')
+    extract_parser.add_argument('--prefix', action='append', help='Prefix nama tensor (boleh berulang)')
+    extract_parser.add_argument('--output-dir', help='Folder tujuan (default: folder ComfyUI sesuai preset)')
+    extract_parser.add_argument('--filename', help='Nama file output')
+    extract_parser.add_argument('--keep-prefix', action='store_true', help='Jangan buang prefix dari nama tensor')
+    extract_parser.add_argument('--list', action='store_true', help='Tampilkan grup tensor di header saja')
+
+    subparsers.add_parser('engines', help='Tampilkan engine download dan riwayat throughput per host')
+
+    migrate_parser = subparsers.add_parser('migrate', help='Lanjutkan migrasi staging -> volume yang tertunda')
+    migrate_parser.add_argument('--stage-dir', help='Direktori staging (default: STAGING_DIR)')
+
+    args = parser.parse_args(argv)
+    if args.command in ('download', 'batch'):
+        # Menu interaktif & subcommand lain tetap menulis langsung ke stdout
+        enable_stdout_capture()
+    if args.command == 'batch' and args.stream and args.preflight:
+        # Preflight butuh seluruh manifest di memori, bertentangan dengan mode streaming
+        parser.error('--preflight tidak bisa digabung dengan --stream')
+
+    profiler = None
+    if getattr(args, 'profile', False) or getattr(args, 'cprofile', None):
+        profiler = enable_profiling(use_cprofile=bool(args.cprofile))
+
+    if getattr(args, 'cache_friendly', False):
+        enable_cache_friendly_writes()
+
+    if INFERENCE_THROTTLE or getattr(args, 'yield_to_comfyui', False):
+        enable_inference_throttle(getattr(args, 'comfyui_url', None), getattr(args, 'busy_flag', None))
+
+    # Run yang gagal tetap menulis report profiler/throttle sebelum proses keluar
+    exit_code = 0
+    if profiler is not None:
+        profiler.start_cprofile()
+    try:
+        if args.command == 'download':
+            if not quick_download(args.url, args.directory, args.filename):
+                exit_code = 1
+        elif args.command == 'batch' and args.stream:
+            batch_download_stream(args.manifest, args.report, args.parallel, args.window, args.stage_dir)
+        elif args.command == 'batch':
+            batch_download_manifest(args.manifest, args.parallel, args.warmup, args.stage_dir,
+                                    args.preflight, args.preflight_report, args.scheduler)
+        elif args.command == 'warmup':
+            budget = int(args.budget_gb * 1024**3) if args.budget_gb is not None else None
+            if args.manifest:
+                warmup_manifest(args.manifest, args.workers, budget)
+            if args.paths:
+                warmup_files(args.paths, args.workers, budget)
+        elif args.command == 'validate':
+            result = validate_model_folders(args.paths or None, args.config, args.workers)
+            if result['invalid']:
+                exit_code = 1
+        elif args.command == 'prefetch':
+            result = prefetch_workflows(args.workflows, args.catalog, args.parallel, args.config, args.dry_run,
+                                        args.stage_dir)
+            if result['unresolved'] or (result['batch'] and result['batch']['failed']):
+                exit_code = 1
+        elif args.command == 'replicate':
+            summary = replicate(args.source, args.target, args.workers, args.verify, args.dry_run)
+            if summary['failed']:
+                exit_code = 1
+        elif args.command == 'extract':
+            path = extract_tensors(args.url, args.component, args.prefix, args.output_dir, args.filename,
+                                   strip_prefix=not args.keep_prefix, list_only=args.list)
+            if path is None and not args.list:
+                exit_code = 1
+        elif args.command == 'engines':
+            show_engines()
+        elif args.command == 'migrate':
+            storage = get_tiered_storage(args.stage_dir)
+            if storage is None:
+                print("❌ Direktori staging tidak dikonfigurasi (--stage-dir atau STAGING_DIR)")
+                exit_code = 1
+        elif args.command == 'daemon':
+            run_daemon(args.socket, args.host, args.port, args.workers)
+        elif args.command == 'submit':
+            client = DaemonClient(args.socket, port=args.port)
+            print(json.dumps(client.enqueue(args.url, os.path.abspath(args.directory), args.filename), indent=2))
+        else:
+            interactive_menu()
+
+        # Proses CLI jangan keluar sebelum migrasi staging -> volume selesai
+        for storage in _TIERED_STORAGE.values():
+            storage.wait()
+    finally:
+        if profiler is not None:
+            profiler.stop_cprofile()
+        THROTTLE.print_stats()
+        THROTTLE.stop()
+
+        if profiler is not None:
+            profiler.print_report()
+            profiler.write_trace(args.trace)
+            if args.cprofile:
+                profiler.write_cprofile(args.cprofile)
+
+    if exit_code:
+        sys.exit(exit_code)
 
 # =============================================
 # RUN PROGRAM
@@ -1068,8 +5627,14 @@ def interactive_menu():
 
 if __name__ == "__main__":
     try:
-        # Mode 1: Interactive menu (default)
-        interactive_menu()
+        # Mode 1: Interactive menu (default, tanpa argumen)
+        #         atau subcommand CLI: download URL DIR, batch MANIFEST [--profile],
+        #         warmup PATH..., validate [PATH...],
+        #         prefetch WORKFLOW... --catalog FILE, migrate --stage-dir DIR,
+        #         daemon [--socket], submit URL DIR, replicate SRC DST, engines,
+        #         extract URL --component vae
+        #         (tambahkan --yield-to-comfyui untuk mengalah saat ComfyUI inference)
+        main_cli()
 
         # Mode 2: Quick single download
         # quick_download("https://huggingface.co/USER/REPO/resolve/main/model.safetensors", "/path/to/dir")